@@ -1,27 +1,167 @@
+import heapq
 import os
 
 import boto3
+from boto3.dynamodb.conditions import Key
 
 s3 = boto3.client("s3")
+dynamodb = boto3.resource("dynamodb")
 # Must match plotting Lambda upload key (see lambda/plotting/handler.py PLOT_KEY).
 SKIP_KEYS = frozenset({"plot", "plot.png"})
+# "listing" lists the whole bucket; "index" reads the size-ordered object index
+# the size tracker keeps in delta mode (needs TABLE_NAME)
+CLEANER_SOURCE = os.environ.get("CLEANER_SOURCE", "listing")
+# When set, evict the largest objects until the bucket is at or below this many
+# bytes in one invocation, instead of deleting a single object per alarm
+CLEANER_TARGET_SIZE = os.environ.get("CLEANER_TARGET_SIZE")
+# Most objects one invocation will consider (size of the top-K heap)
+CLEANER_MAX_EVICTIONS = int(os.environ.get("CLEANER_MAX_EVICTIONS", "1000"))
+DELETE_BATCH_SIZE = 1000  # delete_objects limit
 
 
-def handler(event, context):
-    bucket_name = os.environ["BUCKET_NAME"]
+def find_largest_listed(bucket_name):
+    """List all objects and return (key, size) of the largest, or None."""
+    largest = None
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name):
+        for obj in page.get("Contents", []):
+            if obj["Key"] not in SKIP_KEYS and (
+                largest is None or obj["Size"] > largest[1]
+            ):
+                largest = (obj["Key"], obj["Size"])
+    return largest
+
+
+def find_largest_indexed(table, bucket_name):
+    """Return (key, size) of the largest object with one GSI query, or None.
+
+    The tracker stores each object under partition "<bucket>#objects" with its
+    size as total_size (see object_index_key in lambda/size_tracking/handler.py),
+    so bucket-size-index returns them largest first. The tracker never indexes
+    SKIP_KEYS, so the first entry is the answer.
+    """
+    response = table.query(
+        IndexName="bucket-size-index",
+        KeyConditionExpression=Key("bucket_name").eq(f"{bucket_name}#objects"),
+        ScanIndexForward=False,
+        Limit=1,
+    )
+    for item in response["Items"]:
+        return item["timestamp"], int(item["total_size"])
+    return None
+
 
-    # List all objects and find the largest
-    objects = []
+def pick_victims(candidates, total_size, target_size):
+    """Take (size, key) candidates, largest first, until total_size <= target_size.
+
+    Returns (keys to delete, size left afterwards). Stops reading candidates as
+    soon as the target is reached.
+    """
+    victims = []
+    for size, key in candidates:
+        if total_size <= target_size:
+            break
+        victims.append(key)
+        total_size -= size
+    return victims, total_size
+
+
+def plan_evictions_listed(bucket_name, target_size):
+    """One streaming pass over the listing: the total plus a bounded min-heap of
+    the CLEANER_MAX_EVICTIONS largest objects, never the full listing."""
+    total_size = 0
+    heap = []  # (size, key), smallest on top
     paginator = s3.get_paginator("list_objects_v2")
     for page in paginator.paginate(Bucket=bucket_name):
         for obj in page.get("Contents", []):
-            if obj["Key"] not in SKIP_KEYS:
-                objects.append(obj)
+            if obj["Key"] in SKIP_KEYS:
+                continue
+            total_size += obj["Size"]
+            item = (obj["Size"], obj["Key"])
+            if len(heap) < CLEANER_MAX_EVICTIONS:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+    return pick_victims(sorted(heap, reverse=True), total_size, target_size)
+
+
+def iter_indexed_by_size(table, bucket_name):
+    """Yield (size, key) from the object index, largest first, page by page."""
+    kwargs = {
+        "IndexName": "bucket-size-index",
+        "KeyConditionExpression": Key("bucket_name").eq(f"{bucket_name}#objects"),
+        "ScanIndexForward": False,
+    }
+    while True:
+        response = table.query(**kwargs)
+        for item in response["Items"]:
+            yield int(item["total_size"]), item["timestamp"]
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def indexed_total_size(table, bucket_name):
+    """Bucket size from the tracker's running total, which leaves out SKIP_KEYS."""
+    item = table.get_item(
+        Key={"bucket_name": f"{bucket_name}#total", "timestamp": "current"}
+    ).get("Item")
+    return int(item["total_size"]) if item else 0
+
+
+def plan_evictions_indexed(table, bucket_name, target_size):
+    total_size = indexed_total_size(table, bucket_name)
+    return pick_victims(
+        iter_indexed_by_size(table, bucket_name), total_size, target_size
+    )
+
+
+def delete_in_batches(bucket_name, keys):
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        chunk = keys[start : start + DELETE_BATCH_SIZE]
+        response = s3.delete_objects(
+            Bucket=bucket_name,
+            Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True},
+        )
+        for error in response.get("Errors", []):
+            print(f"Warning: could not delete {error['Key']}: {error['Message']}")
+
+
+def evict_to_target(bucket_name, target_size):
+    if CLEANER_SOURCE == "index":
+        table = dynamodb.Table(os.environ["TABLE_NAME"])
+        victims, remaining = plan_evictions_indexed(table, bucket_name, target_size)
+    else:
+        victims, remaining = plan_evictions_listed(bucket_name, target_size)
+
+    if not victims:
+        print(f"Bucket already at or below {target_size} bytes, nothing to delete.")
+        return
+    print(
+        f"Deleting {len(victims)} largest objects, "
+        f"{remaining} bytes left (target {target_size})"
+    )
+    delete_in_batches(bucket_name, victims)
+
+
+def handler(event, context):
+    # The size tracker names the bucket when it invokes us directly
+    bucket_name = event.get("bucket_name") or os.environ["BUCKET_NAME"]
+
+    if CLEANER_TARGET_SIZE is not None:
+        evict_to_target(bucket_name, int(CLEANER_TARGET_SIZE))
+        return
+
+    if CLEANER_SOURCE == "index":
+        table = dynamodb.Table(os.environ["TABLE_NAME"])
+        largest = find_largest_indexed(table, bucket_name)
+    else:
+        largest = find_largest_listed(bucket_name)
 
-    if not objects:
+    if largest is None:
         print("Bucket is empty, nothing to delete.")
         return
 
-    largest = max(objects, key=lambda o: o["Size"])
-    print(f"Deleting largest object: {largest['Key']} ({largest['Size']} bytes)")
-    s3.delete_object(Bucket=bucket_name, Key=largest["Key"])
+    key, size = largest
+    print(f"Deleting largest object: {key} ({size} bytes)")
+    s3.delete_object(Bucket=bucket_name, Key=key)
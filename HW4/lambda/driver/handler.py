@@ -1,31 +1,77 @@
 import os
+import random
 import time
+from datetime import datetime, timezone
 
 import boto3
 import urllib3
+from boto3.dynamodb.conditions import Key
+from bucket_scan import SCAN_CLIENT_CONFIG, scan_bucket
 
-s3 = boto3.client("s3")
+s3 = boto3.client("s3", config=SCAN_CLIENT_CONFIG)
+dynamodb = boto3.resource("dynamodb")
+# Size tracker's history table; without it the driver falls back to listing
+HISTORY_TABLE = os.environ.get("TABLE_NAME")
+# Plot image the plotting Lambda writes into the bucket, not part of the threshold
+# (the size tracker leaves it out of its history too)
+SKIP_KEYS = frozenset({"plot", "plot.png"})
+# First backoff step when waiting for the cleaner, doubled up to max_interval
+INITIAL_INTERVAL = 0.25
 
 
-def wait_for_size_below_threshold(bucket_name, threshold=20, timeout=180, interval=10):
-    """Poll until total bucket size drops below threshold (Cleaner has run)."""
-    waited = 0
-    while waited < timeout:
-        total_size = 0
-        paginator = s3.get_paginator("list_objects_v2")
-        for page in paginator.paginate(Bucket=bucket_name):
-            for obj in page.get("Contents", []):
-                if obj["Key"] != "plot.png":
-                    total_size += obj["Size"]
+def latest_history_size(table, bucket_name, since_iso):
+    """total_size of the newest history row written after since_iso, or None."""
+    response = table.query(
+        KeyConditionExpression=Key("bucket_name").eq(bucket_name)
+        & Key("timestamp").gt(since_iso),
+        ScanIndexForward=False,
+        Limit=1,
+        ProjectionExpression="total_size",
+    )
+    items = response["Items"]
+    return int(items[0]["total_size"]) if items else None
+
+
+def wait_for_size_below_threshold(bucket_name, threshold=20, timeout=180, max_interval=10):
+    """Wait until total bucket size drops below threshold (Cleaner has run).
+
+    With TABLE_NAME set each poll reads the size tracker's newest history row,
+    with exponential backoff and full jitter, and the bucket is only listed
+    once more on timeout. Without it every poll lists the whole bucket, so
+    polls stay max_interval apart as before.
+    """
+    # Rows from before the wait don't reflect the put the caller just made
+    since_iso = datetime.now(timezone.utc).isoformat()
+    table = dynamodb.Table(HISTORY_TABLE) if HISTORY_TABLE else None
+    deadline = time.monotonic() + timeout
+    delay = INITIAL_INTERVAL if table else max_interval
+    while True:
+        if table:
+            total_size = latest_history_size(table, bucket_name, since_iso)
+        else:
+            total_size, _ = scan_bucket(s3, bucket_name, skip_keys=SKIP_KEYS)
 
-        print(f"Current total size: {total_size} bytes")
+        if total_size is not None:
+            print(f"Current total size: {total_size} bytes")
+            if total_size <= threshold:
+                print("Size below threshold, Cleaner has done its job.")
+                return True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # Jitter would bring listing polls under max_interval apart again
+        time.sleep(min(remaining, random.uniform(0, delay) if table else delay))
+        delay = min(max_interval, delay * 2)
+
+    if table:
+        # History didn't confirm it in time: count directly
+        total_size, _ = scan_bucket(s3, bucket_name, skip_keys=SKIP_KEYS)
+        print(f"Current total size (listing): {total_size} bytes")
         if total_size <= threshold:
             print("Size below threshold, Cleaner has done its job.")
             return True
 
-        time.sleep(interval)
-        waited += interval
-
     print("Timeout: Cleaner did not run in time.")
     return False
 
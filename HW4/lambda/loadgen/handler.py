@@ -0,0 +1,315 @@
+import bisect
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+
+dynamodb = boto3.resource("dynamodb")
+s3_clients = {}  # concurrency -> S3 client, reused while the container is warm
+
+# Defaults for every field of the workload spec passed in the event
+DEFAULT_WORKLOAD = {
+    "object_count": 100,  # distinct keys the workload draws from
+    "operations": 500,  # total S3 requests to issue
+    # "fixed" (size), "uniform" (min..max) or "lognormal" (mean/sigma of log bytes)
+    "size": {"distribution": "uniform", "min": 1, "max": 1024},
+    # relative weights; put creates a new key, overwrite/delete hit a live one
+    "mix": {"put": 0.6, "overwrite": 0.3, "delete": 0.1},
+    "concurrency": 16,
+    "ops_per_second": 50,  # 0 for as fast as the workers go
+    "key_prefix": "load/",
+    # time to let the pipeline catch up before reading history rows
+    "settle_seconds": 30,
+    "seed": None,
+}
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_LIMIT = 100
+
+
+def draw_size(rng, spec):
+    if spec["distribution"] == "fixed":
+        return int(spec["size"])
+    if spec["distribution"] == "lognormal":
+        return max(1, int(rng.lognormvariate(spec["mean"], spec["sigma"])))
+    return rng.randint(spec["min"], spec["max"])
+
+
+def plan_operations(workload, rng):
+    """Return [(kind, key, size)] in issue order.
+
+    Keys are tracked as the plan is built, so overwrites and deletes always
+    target a key that exists at that point; with no live key (or no free key
+    for a put) the operation falls back to whichever kind is possible.
+    """
+    kinds = list(workload["mix"])
+    weights = [workload["mix"][k] for k in kinds]
+    free = [f"{workload['key_prefix']}{i:06d}" for i in range(workload["object_count"])]
+    rng.shuffle(free)
+    live = []
+    plan = []
+    for kind in rng.choices(kinds, weights, k=workload["operations"]):
+        if kind == "put" and not free:
+            kind = "overwrite"
+        elif kind in ("overwrite", "delete") and not live:
+            kind = "put"
+
+        if kind == "put":
+            key = free.pop()
+            live.append(key)
+        elif kind == "overwrite":
+            key = rng.choice(live)
+        else:
+            i = rng.randrange(len(live))
+            live[i], live[-1] = live[-1], live[i]
+            key = live.pop()
+            free.append(key)
+        size = draw_size(rng, workload["size"]) if kind != "delete" else 0
+        plan.append((kind, key, size))
+    return plan
+
+
+class Pacer:
+    """Hands out evenly spaced start times so all workers together hit the rate."""
+
+    def __init__(self, ops_per_second):
+        self.interval = 1.0 / ops_per_second if ops_per_second else 0.0
+        self.next_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            at = self.next_at
+            self.next_at = max(at, time.monotonic()) + self.interval
+        delay = at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def s3_client(concurrency):
+    """S3 client with a connection for every worker.
+
+    botocore pools 10 connections per client by default; with more workers
+    than that the pool, not the workload, would cap the achieved rate.
+    """
+    if concurrency not in s3_clients:
+        s3_clients[concurrency] = boto3.client(
+            "s3", config=Config(max_pool_connections=max(10, concurrency))
+        )
+    return s3_clients[concurrency]
+
+
+def run_shard(s3, bucket_name, ops, pacer):
+    """Issue one shard's operations in order, return a result per operation."""
+    results = []
+    for kind, key, size in ops:
+        pacer.wait()
+        started = time.time()
+        try:
+            if kind == "delete":
+                s3.delete_object(Bucket=bucket_name, Key=key)
+            else:
+                s3.put_object(Bucket=bucket_name, Key=key, Body=b"x" * size)
+            error = None
+        except Exception as e:
+            error = str(e)
+        results.append(
+            {
+                "kind": kind,
+                "key": key,
+                "size": size,
+                "started": started,
+                "finished": time.time(),
+                "error": error,
+            }
+        )
+    return results
+
+
+def run_workload(bucket_name, plan, concurrency, ops_per_second):
+    """Run the plan on a thread pool; returns (results, elapsed seconds).
+
+    Operations are sharded by key, so requests for one key are issued in plan
+    order by a single worker and never race each other.
+    """
+    shards = [[] for _ in range(concurrency)]
+    for op in plan:
+        shards[zlib.crc32(op[1].encode()) % concurrency].append(op)
+
+    s3 = s3_client(concurrency)
+    pacer = Pacer(ops_per_second)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(run_shard, s3, bucket_name, shard, pacer) for shard in shards
+        ]
+        results = [r for f in futures for r in f.result()]
+    return results, time.monotonic() - started
+
+
+def history_times(table, bucket_name, since):
+    """POSIX times of every history row written for the bucket since `since`."""
+    kwargs = {
+        "KeyConditionExpression": Key("bucket_name").eq(bucket_name)
+        & Key("timestamp").gte(datetime.fromtimestamp(since, timezone.utc).isoformat()),
+        "ProjectionExpression": "#ts",
+        "ExpressionAttributeNames": {"#ts": "timestamp"},
+    }
+    times = []
+    while True:
+        response = table.query(**kwargs)
+        times.extend(
+            datetime.fromisoformat(item["timestamp"]).timestamp()
+            for item in response["Items"]
+        )
+        if "LastEvaluatedKey" not in response:
+            return sorted(times)
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def indexed_objects(table, bucket_name, object_keys):
+    """{object key: (size, POSIX indexed_at)} from the size tracker's object
+    index. Only delta mode keeps one; in recount mode this is empty.
+
+    Must match object_index_key in lambda/size_tracking/handler.py.
+    """
+    client = dynamodb.meta.client  # takes plain Python values like the Table API
+    keys = [
+        {"bucket_name": f"{bucket_name}#objects", "timestamp": k} for k in object_keys
+    ]
+    found = {}
+    for start in range(0, len(keys), BATCH_GET_LIMIT):
+        request = {
+            table.name: {
+                "Keys": keys[start : start + BATCH_GET_LIMIT],
+                "ProjectionExpression": "#ts, total_size, indexed_at",
+                "ExpressionAttributeNames": {"#ts": "timestamp"},
+            }
+        }
+        while request:
+            response = client.batch_get_item(RequestItems=request)
+            for item in response["Responses"].get(table.name, []):
+                if "indexed_at" in item:
+                    found[item["timestamp"]] = (
+                        int(item["total_size"]),
+                        datetime.fromisoformat(item["indexed_at"]).timestamp(),
+                    )
+            request = response.get("UnprocessedKeys")
+    return found
+
+
+def attach_latencies(results, row_times, indexed):
+    """Set the end-to-end latencies on each result (None where unknown).
+
+    end_to_end_lower_bound is the time from issuing the request to the first
+    history row written after it completed. That row may come from a batch
+    that didn't contain the operation, so this only bounds the latency.
+
+    end_to_end is the time until the history row of the batch that applied
+    the operation. It is only known for the last put or overwrite of each key,
+    and only in delta mode: the object's index entry then still holds the
+    operation's size, and its indexed_at was stamped by the batch that applied
+    it, before that batch wrote its history row.
+    """
+    last = {}
+    for result in results:
+        i = bisect.bisect_left(row_times, result["finished"])
+        result["end_to_end_lower_bound"] = (
+            row_times[i] - result["started"]
+            if i < len(row_times) and result["error"] is None
+            else None
+        )
+        result["end_to_end"] = None
+        if result["error"] is None:
+            # Each key's operations ran in plan order on one worker
+            last[result["key"]] = result
+
+    for key, result in last.items():
+        size, indexed_at = indexed.get(key, (None, None))
+        if result["kind"] == "delete" or size != result["size"]:
+            continue
+        if indexed_at < result["started"]:
+            continue  # indexed by an earlier operation of the same size
+        i = bisect.bisect_left(row_times, indexed_at)
+        if i < len(row_times):
+            result["end_to_end"] = row_times[i] - result["started"]
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+    return {
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(values[-1], 3),
+    }
+
+
+def summarize(results, elapsed):
+    ok = [r for r in results if r["error"] is None]
+    latencies = [r["end_to_end"] for r in ok if r["end_to_end"] is not None]
+    bounds = [
+        r["end_to_end_lower_bound"]
+        for r in ok
+        if r["end_to_end_lower_bound"] is not None
+    ]
+    counts = {}
+    for r in results:
+        counts[r["kind"]] = counts.get(r["kind"], 0) + 1
+    return {
+        "operations": len(results),
+        "errors": len(results) - len(ok),
+        "by_kind": counts,
+        "elapsed_seconds": round(elapsed, 3),
+        "achieved_ops_per_second": round(len(ok) / elapsed, 2) if elapsed else None,
+        "bytes_written": sum(r["size"] for r in ok),
+        "request_latency": percentiles([r["finished"] - r["started"] for r in ok]),
+        # Only for the operations matched to their batch (see attach_latencies)
+        "end_to_end_latency": percentiles(latencies),
+        "matched": len(latencies),
+        "end_to_end_lower_bound": percentiles(bounds),
+        # No history row at all after the request
+        "unmatched": len(ok) - len(bounds),
+    }
+
+
+def handler(event, context):
+    bucket_name = os.environ["BUCKET_NAME"]
+    table = dynamodb.Table(os.environ["TABLE_NAME"])
+
+    workload = {**DEFAULT_WORKLOAD, **(event or {})}
+    rng = random.Random(workload["seed"])
+    plan = plan_operations(workload, rng)
+
+    since = time.time()
+    results, elapsed = run_workload(
+        bucket_name, plan, workload["concurrency"], workload["ops_per_second"]
+    )
+    print(f"Issued {len(results)} operations in {elapsed:.1f}s")
+
+    time.sleep(workload["settle_seconds"])
+    attach_latencies(
+        results,
+        history_times(table, bucket_name, since),
+        indexed_objects(table, bucket_name, {r["key"] for r in results}),
+    )
+
+    report = summarize(results, elapsed)
+    print(json.dumps(report))
+    return report
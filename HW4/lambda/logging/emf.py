@@ -0,0 +1,77 @@
+# CloudWatch Embedded Metric Format: a structured log line that CloudWatch
+# turns into metrics on ingestion, with no metric filter in between.
+# https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+import json
+import time
+
+# Limits from the EMF specification
+MAX_METRICS = 100
+MAX_DIMENSIONS = 30
+
+
+def build_document(namespace, dimensions, metrics, properties=None, timestamp_ms=None):
+    """Return one EMF log line.
+
+    dimensions is {name: value}, metrics is {name: (value, unit)}; properties are
+    extra top-level fields that are logged but not turned into metrics.
+    """
+    doc = dict(properties or {})
+    doc["_aws"] = {
+        "Timestamp": timestamp_ms if timestamp_ms is not None else int(time.time() * 1000),
+        "CloudWatchMetrics": [
+            {
+                "Namespace": namespace,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [
+                    {"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()
+                ],
+            }
+        ],
+    }
+    doc.update(dimensions)
+    doc.update({name: value for name, (value, _) in metrics.items()})
+    return json.dumps(doc)
+
+
+def parse_document(line):
+    """Parse and validate an EMF line (e.g. in tests).
+
+    Returns {"namespace", "dimensions", "metrics", "timestamp"} for the first
+    metric directive; raises ValueError if the line is not valid EMF.
+    """
+    doc = json.loads(line)
+    meta = doc.get("_aws")
+    if not isinstance(meta, dict) or not isinstance(meta.get("Timestamp"), int):
+        raise ValueError("missing _aws.Timestamp")
+    directives = meta.get("CloudWatchMetrics")
+    if not directives:
+        raise ValueError("missing _aws.CloudWatchMetrics")
+
+    directive = directives[0]
+    dimensions = {}
+    for dimension_set in directive["Dimensions"]:
+        if len(dimension_set) > MAX_DIMENSIONS:
+            raise ValueError("too many dimensions")
+        for name in dimension_set:
+            if not isinstance(doc.get(name), str):
+                raise ValueError(f"dimension {name} has no string value")
+            dimensions[name] = doc[name]
+
+    if len(directive["Metrics"]) > MAX_METRICS:
+        raise ValueError("too many metrics")
+    metrics = {}
+    for metric in directive["Metrics"]:
+        value = doc.get(metric["Name"])
+        values = value if isinstance(value, list) else [value]
+        if not values or not all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in values
+        ):
+            raise ValueError(f"metric {metric['Name']} has no numeric value")
+        metrics[metric["Name"]] = value
+
+    return {
+        "namespace": directive["Namespace"],
+        "dimensions": dimensions,
+        "metrics": metrics,
+        "timestamp": meta["Timestamp"],
+    }
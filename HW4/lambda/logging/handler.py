@@ -2,44 +2,165 @@ import json
 import os
 
 import boto3
+from boto3.dynamodb.conditions import Key
+from emf import build_document
+from size_index import CachedSizeIndex, DynamoSizeIndex, LogSearchSizeIndex
 
 logs = boto3.client("logs")
 LOG_GROUP = os.environ.get("LOG_GROUP_NAME", None)  # leave None to use default
+# DynamoDB table (partition key object_name) mapping object key -> size. When
+# unset, deleted sizes are looked up by searching this Lambda's log group.
+SIZE_INDEX_TABLE = os.environ.get("SIZE_INDEX_TABLE")
+# Recent key -> size pairs kept in memory across warm invocations
+SIZE_CACHE_CAPACITY = int(os.environ.get("SIZE_CACHE_CAPACITY", "10000"))
+# How long a "never created" answer may be reused before asking again
+SIZE_CACHE_MISSING_TTL = float(os.environ.get("SIZE_CACHE_MISSING_TTL", "30"))
+# How long a cached size is trusted; another container may overwrite the key
+SIZE_CACHE_RECENT_TTL = float(os.environ.get("SIZE_CACHE_RECENT_TTL", "30"))
 
+# "lines" prints one {"object_name", "size_delta"} line per event for the
+# metric filter; "emf" prints one Embedded Metric Format document per batch.
+# emf needs SIZE_INDEX_TABLE: the log-search fallback finds sizes in the
+# per-event lines, which emf no longer prints.
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "lines")
+METRIC_NAMESPACE = os.environ.get("METRIC_NAMESPACE", "HW4/SizeTracking")
+# Size tracker's history table; emf documents report its total as TotalSize
+HISTORY_TABLE_NAME = os.environ.get("HISTORY_TABLE_NAME")
 
-def get_creation_size(object_name, log_group):
-    """Search logs for the creation event of this object to find its size."""
-    client = boto3.client("logs")
-    response = client.filter_log_events(
-        logGroupName=log_group,
-        filterPattern=f'{{$.object_name = "{object_name}" && $.size_delta > 0}}',
-    )
-    events = response.get("events", [])
-    if events:
-        last = json.loads(events[-1]["message"])
-        return last["size_delta"]
-    return 0
+size_index = None  # built on first invocation, reused while the container is warm
+history_table = None  # likewise
+
+
+def get_size_index(context):
+    global size_index
+    if size_index is None:
+        if LOG_FORMAT == "emf" and not (SIZE_INDEX_TABLE and HISTORY_TABLE_NAME):
+            raise ValueError(
+                "LOG_FORMAT=emf requires SIZE_INDEX_TABLE and HISTORY_TABLE_NAME"
+            )
+        if SIZE_INDEX_TABLE:
+            backing = DynamoSizeIndex(boto3.resource("dynamodb").Table(SIZE_INDEX_TABLE))
+        else:
+            backing = LogSearchSizeIndex(logs, LOG_GROUP or context.log_group_name)
+        size_index = CachedSizeIndex(
+            backing, SIZE_CACHE_CAPACITY, SIZE_CACHE_MISSING_TTL, SIZE_CACHE_RECENT_TTL
+        )
+    return size_index
+
+
+def get_history_table():
+    global history_table
+    if history_table is None:
+        history_table = boto3.resource("dynamodb").Table(HISTORY_TABLE_NAME)
+    return history_table
+
+
+def read_bucket_total(table, bucket_name):
+    """The size tracker's total for the bucket, or None before its first batch.
+
+    Delta mode keeps it in the "<bucket>#total" row (must match
+    running_total_key in lambda/size_tracking/handler.py); recount mode has no
+    such row, and its newest history row holds the total instead.
+    """
+    item = table.get_item(
+        Key={"bucket_name": f"{bucket_name}#total", "timestamp": "current"}
+    ).get("Item")
+    if item is None:
+        items = table.query(
+            KeyConditionExpression=Key("bucket_name").eq(bucket_name),
+            ScanIndexForward=False,
+            Limit=1,
+        )["Items"]
+        item = items[0] if items else None
+    return int(item["total_size"]) if item else None
 
 
 def handler(event, context):
-    log_group = LOG_GROUP or context.log_group_name
+    index = get_size_index(context)
 
+    # Pass 1: walk the batch in event order. Removals of keys created earlier in
+    # the batch are answered from the batch itself; the rest are collected.
+    entries = []  # [bucket_name, object_name, size_delta]; None until resolved
+    unresolved = {}  # object_name -> position in entries
+    latest = {}  # object_name -> size created in this batch, None once removed
     for sqs_record in event["Records"]:
         sns_msg = json.loads(sqs_record["body"])
         s3_event = json.loads(sns_msg["Message"])
 
         for record in s3_event.get("Records", []):
             event_name = record["eventName"]  # e.g. "ObjectCreated:Put"
+            bucket_name = record["s3"]["bucket"]["name"]
             object_name = record["s3"]["object"]["key"]
             size = record["s3"]["object"].get("size", None)
 
             if "ObjectCreated" in event_name:
-                size_delta = size
+                entries.append([bucket_name, object_name, size])
+                latest[object_name] = size
             elif "ObjectRemoved" in event_name:
-                # S3 delete events don't include size — look it up from logs
-                found_size = get_creation_size(object_name, log_group)
-                size_delta = -found_size
-            else:
-                continue
+                if object_name in latest:
+                    entries.append(
+                        [bucket_name, object_name, -(latest[object_name] or 0)]
+                    )
+                else:
+                    # S3 delete events don't include size — look it up below
+                    unresolved[object_name] = len(entries)
+                    entries.append([bucket_name, object_name, None])
+                latest[object_name] = None
 
+    # Pass 2: one bulk lookup for every removal that needs the index. It reads
+    # the state from before this batch; later events are applied afterwards.
+    found = index.pop_many(unresolved) if unresolved else {}
+    for object_name, pos in unresolved.items():
+        entries[pos][2] = -found.get(object_name, 0)
+
+    created = {name: size for name, size in latest.items() if size is not None}
+    if created:
+        index.put_many(created)
+    removed_here = [
+        name for name, size in latest.items() if size is None and name not in unresolved
+    ]
+    if removed_here:
+        index.discard(removed_here)
+
+    index.flush()
+
+    if LOG_FORMAT == "emf":
+        emit_emf(index, entries, get_history_table())
+    else:
+        for _, object_name, size_delta in entries:
             print(json.dumps({"object_name": object_name, "size_delta": size_delta}))
+        print(json.dumps({"size_cache": index.stats}))
+    # Counters in the log are per invocation
+    index.reset_stats()
+
+
+def emit_emf(index, entries, history_table):
+    """Print one EMF document per bucket with the batch's net size change and
+    the bucket's total.
+
+    The total is the size tracker's, which is seeded from a bucket listing and
+    reconciled, rather than a sum of the deltas seen here. The tracker handles
+    the same notifications in parallel, so it may not include this batch yet.
+    """
+    deltas = {}
+    counts = {}
+    for bucket_name, _, size_delta in entries:
+        deltas[bucket_name] = deltas.get(bucket_name, 0) + size_delta
+        counts[bucket_name] = counts.get(bucket_name, 0) + 1
+
+    for bucket_name, size_delta in deltas.items():
+        metrics = {
+            "SizeDelta": (size_delta, "Bytes"),
+            "ObjectEvents": (counts[bucket_name], "Count"),
+        }
+        total_size = read_bucket_total(history_table, bucket_name)
+        if total_size is not None:
+            metrics["TotalSize"] = (total_size, "Bytes")
+        print(
+            build_document(
+                METRIC_NAMESPACE,
+                {"BucketName": bucket_name},
+                metrics,
+                properties={"size_cache": index.stats},
+            )
+        )
@@ -0,0 +1,268 @@
+# Object key -> last known size, so delete events (which carry no size) can be
+# resolved without searching the log group.
+#
+# Every index works on whole batches:
+#   put_many({object_name: size})  objects created or overwritten
+#   pop_many(object_names)         objects removed; returns {object_name: size}
+#                                  for the names that were known
+#   discard(object_names)          drop entries without reading them back
+#   discard_matching({name: size}) drop entries still holding the given size
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Parallel delete_item calls per pop_many; stays under botocore's default of
+# 10 pooled connections
+POP_WORKERS = 8
+# CloudWatch Logs rejects filter patterns longer than 1024 characters
+FILTER_PATTERN_LIMIT = 1024
+
+
+class DynamoSizeIndex:
+    """Index kept in a DynamoDB table with partition key object_name (S)."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def put_many(self, sizes):
+        with self.table.batch_writer(overwrite_by_pkeys=["object_name"]) as batch:
+            for object_name, size in sizes.items():
+                batch.put_item(Item={"object_name": object_name, "size": size})
+
+    def pop_many(self, object_names):
+        # One atomic delete_item(ALL_OLD) per key: the read is strongly
+        # consistent, an overwrite can't slip in between read and delete, and
+        # a redelivered delete finds nothing. The resource's client is
+        # thread-safe (the Table isn't) and takes plain Python values.
+        client = self.table.meta.client
+
+        def pop(object_name):
+            response = client.delete_item(
+                TableName=self.table.name,
+                Key={"object_name": object_name},
+                ReturnValues="ALL_OLD",
+            )
+            old = response.get("Attributes")
+            return object_name, int(old["size"]) if old else None
+
+        with ThreadPoolExecutor(max_workers=POP_WORKERS) as pool:
+            popped = pool.map(pop, dict.fromkeys(object_names))
+            return {name: size for name, size in popped if size is not None}
+
+    def discard(self, object_names):
+        with self.table.batch_writer(overwrite_by_pkeys=["object_name"]) as batch:
+            for object_name in object_names:
+                batch.delete_item(Key={"object_name": object_name})
+
+    def discard_matching(self, sizes):
+        client = self.table.meta.client
+
+        def discard(item):
+            object_name, size = item
+            try:
+                client.delete_item(
+                    TableName=self.table.name,
+                    Key={"object_name": object_name},
+                    ConditionExpression="#size = :size",
+                    ExpressionAttributeNames={"#size": "size"},  # reserved word
+                    ExpressionAttributeValues={":size": size},
+                )
+            except client.exceptions.ConditionalCheckFailedException:
+                pass  # overwritten since; the entry is current
+
+        with ThreadPoolExecutor(max_workers=POP_WORKERS) as pool:
+            list(pool.map(discard, sizes.items()))
+
+
+class InMemorySizeIndex:
+    """Local stand-in for tests and runs without AWS."""
+
+    def __init__(self):
+        self.sizes = {}
+
+    def put_many(self, sizes):
+        self.sizes.update(sizes)
+
+    def pop_many(self, object_names):
+        return {
+            n: self.sizes.pop(n) for n in dict.fromkeys(object_names) if n in self.sizes
+        }
+
+    def discard(self, object_names):
+        for object_name in object_names:
+            self.sizes.pop(object_name, None)
+
+    def discard_matching(self, sizes):
+        for object_name, size in sizes.items():
+            if self.sizes.get(object_name) == size:
+                del self.sizes[object_name]
+
+
+class LogSearchSizeIndex:
+    """Fallback when no table is configured: search this Lambda's own log lines
+    for the last creation of each object. Cost grows with the log group."""
+
+    def __init__(self, logs, log_group):
+        self.logs = logs
+        self.log_group = log_group
+
+    def put_many(self, sizes):
+        pass  # the {"object_name", "size_delta"} log lines are the record
+
+    def _patterns(self, object_names):
+        """OR as many names into each filter pattern as the length limit allows."""
+        prefix = "{ ("
+        suffix = ") && $.size_delta > 0 }"
+        clauses = []
+        length = len(prefix) + len(suffix)
+        for name in object_names:
+            clause = f'$.object_name = "{name}"'
+            extra = len(clause) + (len(" || ") if clauses else 0)
+            if clauses and length + extra > FILTER_PATTERN_LIMIT:
+                yield prefix + " || ".join(clauses) + suffix
+                clauses = []
+                length = len(prefix) + len(suffix)
+                extra = len(clause)
+            clauses.append(clause)
+            length += extra
+        if clauses:
+            yield prefix + " || ".join(clauses) + suffix
+
+    def pop_many(self, object_names):
+        found = {}
+        for pattern in self._patterns(dict.fromkeys(object_names)):
+            kwargs = {"logGroupName": self.log_group, "filterPattern": pattern}
+            while True:
+                response = self.logs.filter_log_events(**kwargs)
+                # Events come back oldest first, so later ones win
+                for event in response.get("events", []):
+                    message = json.loads(event["message"])
+                    found[message["object_name"]] = message["size_delta"]
+                if "nextToken" not in response:
+                    break
+                kwargs["nextToken"] = response["nextToken"]
+        return found
+
+    def discard(self, object_names):
+        pass
+
+    def discard_matching(self, sizes):
+        pass
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (false positives, no false negatives)."""
+
+    def __init__(self, num_bits=1 << 16, num_hashes=4):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray(num_bits // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def clear(self):
+        self.bits = bytearray(self.num_bits // 8)
+
+
+class CachedSizeIndex:
+    """Warm-container cache in front of another index.
+
+    Recently created keys are kept in a bounded LRU, so a delete shortly after
+    the create is answered locally; the remote entry is then dropped in one
+    batched discard at flush(), only if it still holds the cached size.
+    Keys whose lookup came back empty go into a Bloom filter so repeated
+    deletes of never-created keys skip the lookup.
+    Another container may overwrite or create a key, so cached sizes are only
+    trusted for recent_ttl seconds, and the filter is reset after missing_ttl
+    seconds and whenever this container sees a create that hits it.
+    stats counts since the last reset_stats().
+    """
+
+    def __init__(self, backing, capacity=10000, missing_ttl=30, recent_ttl=30):
+        self.backing = backing
+        self.capacity = capacity
+        self.missing_ttl = missing_ttl
+        self.recent_ttl = recent_ttl
+        self.recent = OrderedDict()  # object_name -> (size, remembered at)
+        self.missing = BloomFilter()
+        self.missing_reset_at = time.monotonic()
+        # object_name -> size to discard if still current, None for any size
+        self.pending_discards = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "skipped": 0}
+
+    def _remember(self, object_name, size):
+        self.recent[object_name] = (size, time.monotonic())
+        self.recent.move_to_end(object_name)
+        if len(self.recent) > self.capacity:
+            self.recent.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def put_many(self, sizes):
+        self.backing.put_many(sizes)
+        for object_name, size in sizes.items():
+            self.pending_discards.pop(object_name, None)
+            self._remember(object_name, size)
+            if object_name in self.missing:
+                # Bloom filters can't delete — start over rather than skip a real key
+                self.missing.clear()
+
+    def pop_many(self, object_names):
+        now = time.monotonic()
+        if now - self.missing_reset_at > self.missing_ttl:
+            self.missing.clear()
+            self.missing_reset_at = now
+
+        found = {}
+        lookups = []
+        for object_name in dict.fromkeys(object_names):
+            cached = self.recent.pop(object_name, None)
+            if cached and now - cached[1] <= self.recent_ttl:
+                self.stats["hits"] += 1
+                self.pending_discards[object_name] = cached[0]
+                found[object_name] = cached[0]
+            elif object_name in self.missing:
+                self.stats["skipped"] += 1
+            else:
+                lookups.append(object_name)
+
+        if lookups:
+            self.stats["misses"] += len(lookups)
+            remote = self.backing.pop_many(lookups)
+            found.update(remote)
+            for object_name in lookups:
+                if object_name not in remote:
+                    self.missing.add(object_name)
+        return found
+
+    def discard(self, object_names):
+        for object_name in object_names:
+            self.recent.pop(object_name, None)
+            self.pending_discards[object_name] = None
+
+    def flush(self):
+        """Drop remote entries for deletes that were answered without a remote pop."""
+        if not self.pending_discards:
+            return
+        any_size = [n for n, size in self.pending_discards.items() if size is None]
+        if any_size:
+            self.backing.discard(any_size)
+        matching = {n: s for n, s in self.pending_discards.items() if s is not None}
+        if matching:
+            self.backing.discard_matching(matching)
+        self.pending_discards = {}
@@ -0,0 +1,39 @@
+# Largest-Triangle-Three-Buckets downsampling (Steinarsson, 2013).
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """Return sorted indices of at most n_out + 1 points that keep the shape of y(x).
+
+    x and y are 1-D float arrays with x ascending. The first and last points are
+    always kept, and so is the series maximum, so peaks survive downsampling.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets over the interior points [1, n - 1); every bucket is
+    # non-empty because the step is at least one point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    # The third triangle vertex is the next bucket's average (last point at the end)
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the triangle area for every candidate in the bucket at once
+        area = np.abs(
+            (x[a] - next_x[i]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (next_y[i] - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+
+    return np.union1d(selected, [int(np.argmax(y))])
@@ -1,20 +1,36 @@
 import boto3
-import matplotlib
 import os
 from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
 
-matplotlib.use("Agg")  # non-interactive backend for Lambda
+import hashlib
 import io
 import json
 from datetime import datetime, timedelta, timezone
-import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
+
+import numpy as np
+from downsample import lttb_indices
+from svg_plot import render_svg
 
 s3 = boto3.client("s3")
 ddb = boto3.resource("dynamodb")
+ddb_client = boto3.client("dynamodb")
 PLOT_KEY = "plot"
+# "matplotlib" (PNG) or "svg"; matplotlib is only imported when selected, so the
+# svg backend can run without the matplotlib layer and its cold-start cost
+PLOT_BACKEND = os.environ.get("PLOT_BACKEND", "matplotlib")
 # Query window and x-axis span (title should match this)
-PLOT_WINDOW_MINUTES = 5
+PLOT_WINDOW_MINUTES = int(os.environ.get("PLOT_WINDOW_MINUTES", "5"))
+# Rollups written by the size tracker, finest to coarsest
+# (must match lambda/size_tracking/handler.py)
+ROLLUP_RESOLUTIONS = {"1s": 1, "1m": 60, "1h": 3600, "1d": 86400}
+# Wider windows are downsampled to about this many points before rendering;
+# raw rows are plotted as long as the window holds no more than this
+PLOT_MAX_POINTS = int(os.environ.get("PLOT_MAX_POINTS", "1000"))
+# Past that, the coarsest rollup is picked that still gives this many points
+MIN_PLOT_POINTS = int(os.environ.get("MIN_PLOT_POINTS", "60"))
+# Maintained by the size tracker (must match lambda/size_tracking/handler.py)
+GLOBAL_MAX_KEY = {"bucket_name": "#global-max", "timestamp": "current"}
 
 
 def get_global_max(table, bucket_name):
@@ -31,32 +47,131 @@ def get_global_max(table, bucket_name):
     return 0
 
 
-def handler(event, context):
-    # get the bucket_name and table_name from environment variables
-    bucket_name = os.environ['BUCKET_NAME']
-    table_name = os.environ['TABLE_NAME']
+def read_global_max(table, known_buckets):
+    """Read the materialized global max; one get_item regardless of bucket count."""
+    item = table.get_item(Key=GLOBAL_MAX_KEY).get("Item")
+    if item:
+        return int(item["total_size"])
+    # Not written yet (tracker predates it) — fall back to per-bucket GSI queries
+    return max(get_global_max(table, b) for b in known_buckets)
 
-    table = ddb.Table(table_name)
 
-    # 1. Query last 5 minutes of data for TestBucket (wider window than 10s so
-    #    driver + SQS/Lambda lag still shows multiple points on the plot)
-    now = datetime.now(timezone.utc)
-    window_start = (now - timedelta(minutes=PLOT_WINDOW_MINUTES)).isoformat()
+def more_rows_than(table_name, partition, window_start, limit):
+    """Whether the partition holds more than limit rows from window_start on.
 
-    response = table.query(
-        KeyConditionExpression=boto3.dynamodb.conditions.Key("bucket_name").eq(
-            bucket_name
-        )
-        & boto3.dynamodb.conditions.Key("timestamp").gte(window_start)
+    Reads at most limit + 1 rows; DynamoDB only returns a LastEvaluatedKey
+    when it stopped before the end of the window.
+    """
+    response = ddb_client.query(
+        TableName=table_name,
+        KeyConditionExpression="bucket_name = :pk AND #ts >= :start",
+        ExpressionAttributeNames={"#ts": "timestamp"},
+        ExpressionAttributeValues={
+            ":pk": {"S": partition},
+            ":start": {"S": window_start},
+        },
+        Select="COUNT",
+        Limit=limit + 1,
     )
-    recent_items = response["Items"]
+    return "LastEvaluatedKey" in response
 
-    # 2. Find global max size across ALL buckets (query each bucket key)
-    known_buckets = os.environ.get('KNOWN_BUCKETS', bucket_name).split(',')
-    global_max = max(get_global_max(table, b) for b in known_buckets)
 
-    #  3. Build plot 
-    if not recent_items:
+def history_series(table_name, bucket_name, now, window):
+    """(partition, window_start) of the series to plot.
+
+    Raw rows while the window holds no more than PLOT_MAX_POINTS of them,
+    otherwise the coarsest rollup with MIN_PLOT_POINTS in the window. Rollup
+    rows are keyed by interval start, so window_start is floored to the step
+    to keep the interval the window starts in.
+    """
+    window_start = now - window
+    partition, start = bucket_name, window_start.isoformat()
+    if not more_rows_than(table_name, partition, start, PLOT_MAX_POINTS):
+        return partition, start
+    for resolution, step in ROLLUP_RESOLUTIONS.items():
+        if window.total_seconds() / step >= MIN_PLOT_POINTS:
+            floored = int(window_start.timestamp()) // step * step
+            partition = f"{bucket_name}#{resolution}"
+            start = datetime.fromtimestamp(floored, timezone.utc).isoformat()
+    return partition, start
+
+
+def iter_history_pages(table_name, partition, window_start):
+    """Yield (timestamps, sizes) as raw string lists, one pair per query page.
+
+    Uses the low-level client so items are not deserialized one by one into
+    Decimals. Follows LastEvaluatedKey so windows over 1 MB are not truncated,
+    and projects only the two attributes the plot uses.
+    """
+    paginator = ddb_client.get_paginator("query")
+    for page in paginator.paginate(
+        TableName=table_name,
+        KeyConditionExpression="bucket_name = :pk AND #ts >= :start",
+        ProjectionExpression="#ts, total_size",
+        ExpressionAttributeNames={"#ts": "timestamp"},  # reserved word
+        ExpressionAttributeValues={
+            ":pk": {"S": partition},
+            ":start": {"S": window_start},
+        },
+    ):
+        items = page["Items"]
+        if items:
+            yield (
+                [item["timestamp"]["S"] for item in items],
+                [item["total_size"]["N"] for item in items],
+            )
+
+
+def load_history(table_name, partition, window_start, digest):
+    """Read the window into (datetime64[us] timestamps, int64 sizes) arrays.
+
+    Each page is parsed with vector ops; digest is fed the raw page contents.
+    """
+    ts_chunks = []
+    size_chunks = []
+    for ts_page, size_page in iter_history_pages(table_name, partition, window_start):
+        digest.update("|".join(ts_page).encode())
+        digest.update("|".join(size_page).encode())
+        # Rows are written in UTC by isoformat(); without the offset numpy
+        # parses them directly
+        ts_chunks.append(
+            np.char.replace(np.array(ts_page), "+00:00", "").astype("datetime64[us]")
+        )
+        size_chunks.append(np.array(size_page).astype(np.int64))
+
+    if not ts_chunks:
+        return np.array([], dtype="datetime64[us]"), np.array([], dtype=np.int64)
+    timestamps = np.concatenate(ts_chunks)
+    sizes = np.concatenate(size_chunks)
+    # Query results come back in sort-key order; only sort if that ever breaks
+    if np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind="stable")
+        timestamps = timestamps[order]
+        sizes = sizes[order]
+    return timestamps, sizes
+
+
+def cached_fingerprint(bucket_name):
+    """Fingerprint stored on the last uploaded plot, or None if there is none."""
+    try:
+        head = s3.head_object(Bucket=bucket_name, Key=PLOT_KEY)
+    except ClientError as e:
+        # 403: no s3:GetObject grant, so every call renders as before
+        if e.response["Error"]["Code"] in ("403", "404", "NoSuchKey"):
+            return None
+        raise
+    return head["Metadata"].get("fingerprint")
+
+
+def render_matplotlib(bucket_name, timestamps, sizes, global_max, now):
+    """Render the plot with matplotlib and return PNG bytes."""
+    import matplotlib
+
+    matplotlib.use("Agg")  # non-interactive backend for Lambda
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
+    if len(timestamps) == 0:
         # Nothing to plot yet — create an empty plot with a message
         fig, ax = plt.subplots(figsize=(8, 4))
         ax.text(
@@ -71,14 +186,6 @@ def handler(event, context):
         ax.set_title(f"S3 Bucket Size Change (last {PLOT_WINDOW_MINUTES} min)")
         ax.set_xlim(now - timedelta(minutes=PLOT_WINDOW_MINUTES), now)
     else:
-        # Sort by timestamp
-        recent_items.sort(key=lambda x: x["timestamp"])
-
-        timestamps = [
-            datetime.fromisoformat(item["timestamp"]) for item in recent_items
-        ]
-        sizes = [int(item["total_size"]) for item in recent_items]
-
         fig, ax = plt.subplots(figsize=(10, 5))
 
         # Bucket size over time
@@ -112,17 +219,81 @@ def handler(event, context):
 
     plt.tight_layout()
 
-    # ── 4. Save plot to S3 ───────────────────────────────────────────────────
     buf = io.BytesIO()
     plt.savefig(buf, format="png")
-    buf.seek(0)
     plt.close(fig)
+    return buf.getvalue()
+
+
+def handler(event, context):
+    # get the bucket_name and table_name from environment variables
+    bucket_name = os.environ['BUCKET_NAME']
+    table_name = os.environ['TABLE_NAME']
+
+    table = ddb.Table(table_name)
+
+    # 1. Query last 5 minutes of data for TestBucket (wider window than 10s so
+    #    driver + SQS/Lambda lag still shows multiple points on the plot)
+    now = datetime.now(timezone.utc)
+    window = timedelta(minutes=PLOT_WINDOW_MINUTES)
 
+    partition, window_start = history_series(table_name, bucket_name, now, window)
+    digest = hashlib.sha256(
+        f"{PLOT_BACKEND}|{partition}|{PLOT_WINDOW_MINUTES}|{PLOT_MAX_POINTS}".encode()
+    )
+    timestamps, sizes = load_history(table_name, partition, window_start, digest)
+    # A floored rollup row starts before the window; draw it at the left edge
+    timestamps = np.maximum(
+        timestamps, np.datetime64((now - window).replace(tzinfo=None), "us")
+    )
+
+    # 2. Find global max size across ALL buckets
+    known_buckets = os.environ.get('KNOWN_BUCKETS', bucket_name).split(',')
+    global_max = read_global_max(table, known_buckets)
+
+    # Same series and max as the plot already in S3 — skip rendering and upload
+    digest.update(f"|max={global_max}".encode())
+    fingerprint = digest.hexdigest()
+    if cached_fingerprint(bucket_name) == fingerprint:
+        return {
+            "statusCode": 200,
+            "body": json.dumps(
+                {"message": "Plot unchanged", "key": PLOT_KEY, "cached": True}
+            ),
+            "headers": {"Content-Type": "application/json"},
+        }
+
+    # Render time grows with point count, so thin the series first (shape-preserving)
+    if len(sizes) > PLOT_MAX_POINTS:
+        x = timestamps.astype(np.int64).astype(float)
+        keep = lttb_indices(x, sizes.astype(float), PLOT_MAX_POINTS)
+        timestamps = timestamps[keep]
+        sizes = sizes[keep]
+
+    #  3. Build plot
+    if PLOT_BACKEND == "svg":
+        body = render_svg(
+            timestamps.astype(np.int64) / 1e6,  # POSIX seconds
+            sizes,
+            global_max,
+            title=f"S3 Bucket Size Change (last {PLOT_WINDOW_MINUTES} minutes)",
+            label=f"{bucket_name} size",
+            x_start=now - window,
+            x_end=now,
+            empty_message=f"No data in last {PLOT_WINDOW_MINUTES} minutes",
+        )
+        content_type = "image/svg+xml"
+    else:
+        body = render_matplotlib(bucket_name, timestamps, sizes, global_max, now)
+        content_type = "image/png"
+
+    # ── 4. Save plot to S3 ───────────────────────────────────────────────────
     s3.put_object(
         Bucket=bucket_name,
         Key=PLOT_KEY,
-        Body=buf.getvalue(),
-        ContentType="image/png",
+        Body=body,
+        ContentType=content_type,
+        Metadata={"fingerprint": fingerprint},
     )
 
     return {
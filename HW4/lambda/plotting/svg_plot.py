@@ -0,0 +1,126 @@
+# Minimal SVG line plot — same layout as the matplotlib version in handler.py,
+# without importing matplotlib (which dominates cold start).
+from xml.sax.saxutils import escape
+
+WIDTH = 1000
+HEIGHT = 500
+MARGIN_LEFT = 90
+MARGIN_RIGHT = 30
+MARGIN_TOP = 50
+MARGIN_BOTTOM = 70
+X_TICKS = 6
+Y_TICKS = 5
+# Above this many points the markers are dropped and only the line is drawn
+MAX_MARKERS = 200
+
+
+def _text(x, y, body, size=12, anchor="middle", extra=""):
+    return (
+        f'<text x="{x:.1f}" y="{y:.1f}" font-size="{size}" '
+        f'text-anchor="{anchor}" {extra}>{escape(body)}</text>'
+    )
+
+
+def render_svg(
+    timestamps, sizes, global_max, title, label, x_start, x_end, empty_message=""
+):
+    """Render the size series and global-max line; returns SVG bytes.
+
+    timestamps are POSIX seconds and sizes bytes (NumPy arrays); x_start/x_end
+    are the datetimes bounding the x-axis. With no points only the title and
+    empty_message are drawn.
+    """
+    plot_w = WIDTH - MARGIN_LEFT - MARGIN_RIGHT
+    plot_h = HEIGHT - MARGIN_TOP - MARGIN_BOTTOM
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{HEIGHT}" '
+        f'viewBox="0 0 {WIDTH} {HEIGHT}" font-family="sans-serif">',
+        f'<rect width="{WIDTH}" height="{HEIGHT}" fill="white"/>',
+        _text(WIDTH / 2, MARGIN_TOP / 2 + 6, title, size=16),
+    ]
+
+    if len(timestamps) == 0:
+        parts.append(_text(WIDTH / 2, HEIGHT / 2, empty_message, size=14))
+        parts.append("</svg>")
+        return "\n".join(parts).encode()
+
+    t0 = x_start.timestamp()
+    span = (x_end.timestamp() - t0) or 1.0
+    y_min = min(0, int(sizes.min()))
+    y_max = max(int(sizes.max()), global_max, 1) * 1.1
+    y_span = (y_max - y_min) or 1.0
+
+    def py(size):
+        return MARGIN_TOP + plot_h - (size - y_min) / y_span * plot_h
+
+    # Pixel coordinates for the whole series in one go
+    xs = (MARGIN_LEFT + (timestamps - t0) / span * plot_w).tolist()
+    ys = py(sizes.astype(float)).tolist()
+
+    # Grid, ticks and tick labels
+    for i in range(X_TICKS + 1):
+        x = MARGIN_LEFT + plot_w * i / X_TICKS
+        tick = x_start + (x_end - x_start) * i / X_TICKS
+        parts.append(
+            f'<line x1="{x:.1f}" y1="{MARGIN_TOP}" x2="{x:.1f}" '
+            f'y2="{MARGIN_TOP + plot_h}" stroke="#ccc" stroke-dasharray="4 4"/>'
+        )
+        parts.append(_text(x, MARGIN_TOP + plot_h + 18, tick.strftime("%H:%M:%S")))
+    for i in range(Y_TICKS + 1):
+        value = y_min + y_span * i / Y_TICKS
+        y = py(value)
+        parts.append(
+            f'<line x1="{MARGIN_LEFT}" y1="{y:.1f}" x2="{MARGIN_LEFT + plot_w}" '
+            f'y2="{y:.1f}" stroke="#ccc" stroke-dasharray="4 4"/>'
+        )
+        parts.append(_text(MARGIN_LEFT - 8, y + 4, f"{value:.0f}", anchor="end"))
+
+    # Axes and labels
+    parts.append(
+        f'<rect x="{MARGIN_LEFT}" y="{MARGIN_TOP}" width="{plot_w}" '
+        f'height="{plot_h}" fill="none" stroke="black"/>'
+    )
+    parts.append(_text(MARGIN_LEFT + plot_w / 2, HEIGHT - 20, "Timestamp (UTC)", size=13))
+    parts.append(
+        _text(
+            20,
+            MARGIN_TOP + plot_h / 2,
+            "Total Size (bytes)",
+            size=13,
+            extra=f'transform="rotate(-90 20 {MARGIN_TOP + plot_h / 2:.1f})"',
+        )
+    )
+
+    # Bucket size over time
+    points = " ".join(f"{x:.1f},{y:.1f}" for x, y in zip(xs, ys))
+    parts.append(
+        f'<polyline points="{points}" fill="none" stroke="steelblue" stroke-width="2"/>'
+    )
+    if len(sizes) <= MAX_MARKERS:
+        parts.extend(
+            f'<circle cx="{x:.1f}" cy="{y:.1f}" r="4" fill="steelblue"/>'
+            for x, y in zip(xs, ys)
+        )
+
+    # Max size horizontal line
+    y = py(global_max)
+    parts.append(
+        f'<line x1="{MARGIN_LEFT}" y1="{y:.1f}" x2="{MARGIN_LEFT + plot_w}" '
+        f'y2="{y:.1f}" stroke="red" stroke-width="1.5" stroke-dasharray="8 4"/>'
+    )
+
+    # Legend
+    lx = MARGIN_LEFT + 12
+    ly = MARGIN_TOP + 18
+    parts.append(
+        f'<line x1="{lx}" y1="{ly}" x2="{lx + 24}" y2="{ly}" stroke="steelblue" stroke-width="2"/>'
+    )
+    parts.append(_text(lx + 30, ly + 4, label, anchor="start"))
+    parts.append(
+        f'<line x1="{lx}" y1="{ly + 20}" x2="{lx + 24}" y2="{ly + 20}" '
+        f'stroke="red" stroke-width="1.5" stroke-dasharray="8 4"/>'
+    )
+    parts.append(_text(lx + 30, ly + 24, f"Global max: {global_max} bytes", anchor="start"))
+
+    parts.append("</svg>")
+    return "\n".join(parts).encode()
@@ -0,0 +1,100 @@
+# Prefix-sharded bucket listing for full recounts.
+# Each Lambda is packaged from its own directory, so lambda/driver carries an
+# identical copy of this file — keep the two in sync.
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.config import Config
+
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", "16"))
+# For clients used from the scan's worker threads: botocore's default pool of
+# 10 connections would leave the other workers waiting for one
+SCAN_CLIENT_CONFIG = Config(max_pool_connections=SCAN_WORKERS)
+# How many delimiter levels to expand while looking for shards
+SCAN_MAX_DEPTH = int(os.environ.get("SCAN_MAX_DEPTH", "2"))
+SCAN_DELIMITER = os.environ.get("SCAN_DELIMITER", "/")
+
+
+def _sum_contents(page, skip_keys, on_objects):
+    objects = [
+        (obj["Key"], obj["Size"])
+        for obj in page.get("Contents", [])
+        if obj["Key"] not in skip_keys
+    ]
+    if on_objects and objects:
+        on_objects(objects)
+    return sum(size for _, size in objects), len(objects)
+
+
+def _expand(s3, bucket_name, prefix, skip_keys, on_objects):
+    """List one level under prefix: sum the objects directly under it and
+    return the child prefixes still to be scanned."""
+    total_size = 0
+    object_count = 0
+    children = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(
+        Bucket=bucket_name, Prefix=prefix, Delimiter=SCAN_DELIMITER
+    ):
+        size, count = _sum_contents(page, skip_keys, on_objects)
+        total_size += size
+        object_count += count
+        children.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+    return total_size, object_count, children
+
+
+def _scan_shard(s3, bucket_name, prefix, skip_keys, on_objects):
+    """List everything under prefix (no delimiter)."""
+    total_size = 0
+    object_count = 0
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        size, count = _sum_contents(page, skip_keys, on_objects)
+        total_size += size
+        object_count += count
+    return total_size, object_count
+
+
+def scan_bucket(
+    s3, bucket_name, skip_keys=frozenset(), max_workers=SCAN_WORKERS, on_objects=None
+):
+    """Return (total_size, object_count) for the whole bucket.
+
+    Prefixes are discovered level by level with a delimiter listing until there
+    are enough shards to keep the pool busy (or SCAN_MAX_DEPTH is reached), then
+    every shard is listed concurrently and the per-shard sums are folded into
+    the total as they finish. Objects sitting directly under an expanded prefix
+    are counted during discovery, so nothing is listed twice. A bucket with no
+    delimiter in its keys degrades to a single sequential listing.
+
+    on_objects, if given, is called with [(key, size)] for every page listed,
+    from the worker threads.
+    """
+    total_size = 0
+    object_count = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frontier = [""]
+        for _ in range(SCAN_MAX_DEPTH):
+            futures = [
+                pool.submit(_expand, s3, bucket_name, prefix, skip_keys, on_objects)
+                for prefix in frontier
+            ]
+            frontier = []
+            for future in as_completed(futures):
+                size, count, children = future.result()
+                total_size += size
+                object_count += count
+                frontier.extend(children)
+            if not frontier or len(frontier) >= max_workers:
+                break
+
+        futures = [
+            pool.submit(_scan_shard, s3, bucket_name, prefix, skip_keys, on_objects)
+            for prefix in frontier
+        ]
+        for future in as_completed(futures):
+            size, count = future.result()
+            total_size += size
+            object_count += count
+
+    return total_size, object_count
@@ -1,34 +1,405 @@
+import json
 import os
+import time
 from datetime import datetime, timezone
+from urllib.parse import unquote_plus
 
 import boto3
+from boto3.dynamodb.conditions import Key
+from bucket_scan import SCAN_CLIENT_CONFIG, scan_bucket
 
-s3 = boto3.client("s3")
-dynamodb = boto3.resource("dynamodb")
+s3 = boto3.client("s3", config=SCAN_CLIENT_CONFIG)
+# reconcile writes index entries from the scan workers too
+dynamodb = boto3.resource("dynamodb", config=SCAN_CLIENT_CONFIG)
+# The resource's client takes plain Python values like the Table API does
+client = dynamodb.meta.client
+lambda_client = boto3.client("lambda")
 
+# "recount" lists the whole bucket on every invocation (O(n) in bucket size).
+# "delta" applies the size carried in each S3 event to a running total, so the
+# cost per event stays constant no matter how many objects the bucket holds.
+TRACKING_MODE = os.environ.get("TRACKING_MODE", "recount")
+# A transaction holds at most 100 actions: the objects plus the running total
+TRANSACTION_OBJECTS = 99
+TRANSACTION_ATTEMPTS = 5
+BATCH_WRITE_LIMIT = 25
+
+# The plotting Lambda uploads its image into the tracked bucket. Counting it
+# would make every render write a new history row, so the next render always
+# sees a changed series. Must match SKIP_KEYS in lambda/cleaner/handler.py.
+SKIP_KEYS = frozenset({"plot", "plot.png"})
+
+# When both are set, a total above SIZE_THRESHOLD invokes the cleaner straight
+# away instead of waiting for the CloudWatch alarm to evaluate.
+SIZE_THRESHOLD = os.environ.get("SIZE_THRESHOLD")
+CLEANER_FUNCTION_NAME = os.environ.get("CLEANER_FUNCTION_NAME")
+# Batches finishing within this window of a trigger don't invoke the cleaner again
+EVICTION_DEBOUNCE_SECONDS = int(os.environ.get("EVICTION_DEBOUNCE_SECONDS", "10"))
+
+
+# Bookkeeping items live in the history table under their own partition keys
+# ("<bucket>#total", "<bucket>#objects"), so the plotting query on bucket_name
+# never sees them.
+def running_total_key(bucket_name):
+    return {"bucket_name": f"{bucket_name}#total", "timestamp": "current"}
+
+
+def object_index_key(bucket_name, object_key):
+    # S3 delete events carry no size, so remember each object's last size.
+    # Stored as total_size so the item also lands in bucket-size-index.
+    return {"bucket_name": f"{bucket_name}#objects", "timestamp": object_key}
+
+
+def eviction_lock_key(bucket_name):
+    return {"bucket_name": f"{bucket_name}#eviction", "timestamp": "lock"}
+
+
+# Highest total_size seen across all tracked buckets.
+# Must match GLOBAL_MAX_KEY in lambda/plotting/handler.py.
+GLOBAL_MAX_KEY = {"bucket_name": "#global-max", "timestamp": "current"}
+
+
+# Downsampled copies of the history (min/max/last/count per interval) so long
+# plotting windows don't read every raw row. Ordered finest to coarsest.
+# Must match ROLLUP_RESOLUTIONS in lambda/plotting/handler.py.
+ROLLUP_RESOLUTIONS = {"1s": 1, "1m": 60, "1h": 3600, "1d": 86400}
+
+
+def rollup_key(bucket_name, resolution, now):
+    step = ROLLUP_RESOLUTIONS[resolution]
+    start = int(now.timestamp()) // step * step
+    return {
+        "bucket_name": f"{bucket_name}#{resolution}",
+        "timestamp": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+    }
+
+
+def parse_s3_records(sqs_record):
+    """Unwrap one SQS message (SNS-wrapped S3 notification) into its S3 records."""
+    sns_msg = json.loads(sqs_record["body"])
+    s3_event = json.loads(sns_msg["Message"])
+    # s3:TestEvent messages have no Records
+    return s3_event.get("Records", [])
 
-def handler(event, context):
-    # get the bucket_name and table_name from environment variables
-    bucket_name = os.environ["BUCKET_NAME"]
-    table_name = os.environ["TABLE_NAME"]
 
-    # Invoked from SQS (SNS-wrapped S3 events). This handler ignores payload and
-    # recounts the whole bucket — no need to parse Message / S3 event JSON.
+def fold_object_events(records):
+    """Reduce S3 records to each object's final state in the batch:
+    {object_key: size, or None if it ended up removed}."""
+    final = {}
+    for record in records:
+        event_name = record["eventName"]  # e.g. "ObjectCreated:Put"
+        object_key = unquote_plus(record["s3"]["object"]["key"])
+        if event_name.startswith("ObjectCreated"):
+            final[object_key] = record["s3"]["object"].get("size", 0)
+        elif event_name.startswith("ObjectRemoved"):
+            final[object_key] = None
+    return final
 
-    # list all objects in the bucket and calculate total size and object count
-    total_size = 0
-    object_count = 0
-    paginator = s3.get_paginator("list_objects_v2")
-    for page in paginator.paginate(Bucket=bucket_name):
-        for obj in page.get("Contents", []):
-            total_size += obj["Size"]
-            object_count += 1
 
+def apply_object_changes(table, bucket_name, final):
+    """Apply the batch to the object index and the running total together.
+
+    Every chunk of object changes commits in one transaction with the ADD on
+    the running total, each change conditional on the index entry we read. A
+    retried batch then finds the index already updated and adds nothing, and
+    a change made concurrently by another batch makes us re-read and retry.
+    Seeds the index and total with reconcile() if the bucket has no total yet.
+    Returns the (size_delta, count_delta) this call applied.
+    """
+    size_delta = 0
+    count_delta = 0
+    keys = list(final)
+    for start in range(0, len(keys), TRANSACTION_OBJECTS):
+        chunk = {k: final[k] for k in keys[start : start + TRANSACTION_OBJECTS]}
+        for attempt in range(TRANSACTION_ATTEMPTS):
+            try:
+                size, count = _apply_chunk(table, bucket_name, chunk)
+                break
+            except client.exceptions.TransactionCanceledException as e:
+                reasons = [r.get("Code") for r in e.response.get("CancellationReasons", [])]
+                if reasons and reasons[-1] == "ConditionalCheckFailed":
+                    # No running total yet: seed index and total from the bucket
+                    # (the listing already includes this batch), then re-read
+                    reconcile(table, bucket_name)
+                if attempt == TRANSACTION_ATTEMPTS - 1:
+                    raise
+        size_delta += size
+        count_delta += count
+    return size_delta, count_delta
+
+
+def _apply_chunk(table, bucket_name, chunk):
+    keys = [object_index_key(bucket_name, k) for k in chunk]
+    response = client.batch_get_item(
+        RequestItems={table.name: {"Keys": keys, "ConsistentRead": True}}
+    )
+    # A few dozen keys at most, well under the 16 MB response limit; retry the rest
+    found = response["Responses"].get(table.name, [])
+    unprocessed = response.get("UnprocessedKeys")
+    while unprocessed:
+        response = client.batch_get_item(RequestItems=unprocessed)
+        found.extend(response["Responses"].get(table.name, []))
+        unprocessed = response.get("UnprocessedKeys")
+    old_sizes = {item["timestamp"]: int(item["total_size"]) for item in found}
+
+    now = datetime.now(timezone.utc).isoformat()
+    actions = []
+    size_delta = 0
+    count_delta = 0
+    for object_key, size in chunk.items():
+        old = old_sizes.get(object_key)
+        key = object_index_key(bucket_name, object_key)
+        if old is None:
+            condition = {"ConditionExpression": "attribute_not_exists(total_size)"}
+        else:
+            condition = {
+                "ConditionExpression": "total_size = :old",
+                "ExpressionAttributeValues": {":old": old},
+            }
+
+        if size is None and old is not None:
+            actions.append({"Delete": {"TableName": table.name, "Key": key, **condition}})
+            size_delta -= old
+            count_delta -= 1
+        elif size is not None and size != old:
+            item = {**key, "total_size": size, "indexed_at": now}
+            actions.append({"Put": {"TableName": table.name, "Item": item, **condition}})
+            size_delta += size - (old or 0)
+            count_delta += old is None
+        # otherwise: already in this state (a retry, or a no-op overwrite)
+
+    if not actions:
+        return 0, 0
+    actions.append(
+        {
+            "Update": {
+                "TableName": table.name,
+                "Key": running_total_key(bucket_name),
+                "UpdateExpression": "ADD total_size :size, object_count :count",
+                "ConditionExpression": "attribute_exists(total_size)",
+                "ExpressionAttributeValues": {":size": size_delta, ":count": count_delta},
+            }
+        }
+    )
+    client.transact_write_items(TransactItems=actions)
+    return size_delta, count_delta
+
+
+def read_running_total(table, bucket_name):
+    item = table.get_item(Key=running_total_key(bucket_name), ConsistentRead=True).get(
+        "Item"
+    )
+    if item is None:
+        # Nothing in the batch changed the index, and the bucket has no total yet
+        return reconcile(table, bucket_name)
+    return int(item["total_size"]), int(item["object_count"])
+
+
+def reconcile(table, bucket_name):
+    """Recount the bucket, rebuild its object index and reset the running total.
+
+    Index entries not rewritten by the listing (objects deleted without an
+    event we saw) are swept afterwards, unless a batch updated them meanwhile.
+    The total is overwritten at the end, so changes applied by batches running
+    during the listing may be lost; run it while the bucket is quiet.
+    """
+    started = datetime.now(timezone.utc).isoformat()
+
+    def write_entries(objects):
+        # Called from the scan's worker threads; clients are thread-safe
+        items = [
+            {
+                "PutRequest": {
+                    "Item": {
+                        **object_index_key(bucket_name, key),
+                        "total_size": size,
+                        "indexed_at": started,
+                    }
+                }
+            }
+            for key, size in objects
+        ]
+        for i in range(0, len(items), BATCH_WRITE_LIMIT):
+            request = {table.name: items[i : i + BATCH_WRITE_LIMIT]}
+            while request:
+                request = client.batch_write_item(RequestItems=request).get(
+                    "UnprocessedItems"
+                )
+
+    total_size, object_count = scan_bucket(
+        s3, bucket_name, skip_keys=SKIP_KEYS, on_objects=write_entries
+    )
+    sweep_index(table, bucket_name, started)
+    table.put_item(
+        Item={
+            **running_total_key(bucket_name),
+            "total_size": total_size,
+            "object_count": object_count,
+        }
+    )
+    print(f"Reconciled {bucket_name}: {total_size} bytes, {object_count} objects")
+    return total_size, object_count
+
+
+def sweep_index(table, bucket_name, started):
+    """Delete index entries last written before `started`."""
+    stale = "attribute_not_exists(indexed_at) OR indexed_at < :started"
+    kwargs = {
+        "KeyConditionExpression": Key("bucket_name").eq(f"{bucket_name}#objects"),
+        "FilterExpression": stale,
+        "ProjectionExpression": "#ts",
+        "ExpressionAttributeNames": {"#ts": "timestamp"},
+        "ExpressionAttributeValues": {":started": started},
+    }
+    while True:
+        response = table.query(**kwargs)
+        for item in response["Items"]:
+            try:
+                table.delete_item(
+                    Key=object_index_key(bucket_name, item["timestamp"]),
+                    ConditionExpression=stale,
+                    ExpressionAttributeValues={":started": started},
+                )
+            except client.exceptions.ConditionalCheckFailedException:
+                pass  # updated by a batch since the sweep read it
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def update_global_max(table, bucket_name, total_size):
+    """Raise the materialized global max if total_size exceeds it."""
+    try:
+        table.update_item(
+            Key=GLOBAL_MAX_KEY,
+            UpdateExpression="SET total_size = :size, source_bucket = :bucket",
+            ConditionExpression="attribute_not_exists(total_size) OR total_size < :size",
+            ExpressionAttributeValues={":size": total_size, ":bucket": bucket_name},
+        )
+    except client.exceptions.ConditionalCheckFailedException:
+        pass  # current max is already at least as large
+
+
+def arm_eviction(table, bucket_name):
+    """Mark the bucket as at or below the threshold, so the next crossing fires.
+
+    Only writes when a claim disarmed the lock; most batches under the
+    threshold find it armed (or never claimed) and leave it alone.
+    """
+    try:
+        table.update_item(
+            Key=eviction_lock_key(bucket_name),
+            UpdateExpression="SET armed = :true",
+            ConditionExpression="armed = :false",
+            ExpressionAttributeValues={":true": True, ":false": False},
+        )
+    except client.exceptions.ConditionalCheckFailedException:
+        pass  # already armed
+
+
+def claim_eviction(table, bucket_name, total_size):
+    """Take the bucket's eviction lock for EVICTION_DEBOUNCE_SECONDS.
+
+    Only succeeds once per crossing: the claim disarms the lock, and it is
+    re-armed by the next batch that sees the bucket back under the threshold.
+    Returns False if the lock is disarmed or another batch took it within the
+    window, so concurrent batches crossing the threshold trigger the cleaner once.
+    """
+    now = int(time.time())
+    try:
+        table.update_item(
+            Key=eviction_lock_key(bucket_name),
+            UpdateExpression=(
+                "SET locked_until = :until, triggered_size = :size, armed = :false"
+            ),
+            ConditionExpression=(
+                "(attribute_not_exists(armed) OR armed = :true) AND "
+                "(attribute_not_exists(locked_until) OR locked_until <= :now)"
+            ),
+            ExpressionAttributeValues={
+                ":until": now + EVICTION_DEBOUNCE_SECONDS,
+                ":size": total_size,
+                ":now": now,
+                ":true": True,
+                ":false": False,
+            },
+        )
+    except client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
+
+
+def check_threshold(table, bucket_name, total_size):
+    """Invoke the cleaner asynchronously when total_size crosses SIZE_THRESHOLD.
+
+    total_size already leaves out SKIP_KEYS. Batches that stay above the
+    threshold don't invoke it again; if the cleaner fails to bring the bucket
+    back under, the CloudWatch alarm is what retries it.
+    """
+    if SIZE_THRESHOLD is None or not CLEANER_FUNCTION_NAME:
+        return
+    if total_size <= int(SIZE_THRESHOLD):
+        arm_eviction(table, bucket_name)
+        return
+    if not claim_eviction(table, bucket_name, total_size):
+        print(f"{bucket_name} over threshold, eviction already triggered")
+        return
+    lambda_client.invoke(
+        FunctionName=CLEANER_FUNCTION_NAME,
+        InvocationType="Event",
+        Payload=json.dumps(
+            {
+                "source": "size_tracking",
+                "bucket_name": bucket_name,
+                "total_size": total_size,
+            }
+        ),
+    )
+    print(f"{bucket_name} at {total_size} bytes > {SIZE_THRESHOLD}, invoked cleaner")
+
+
+def update_rollups(table, bucket_name, total_size, now):
+    """Fold one sample into the rollup row of every resolution."""
+    for resolution in ROLLUP_RESOLUTIONS:
+        key = rollup_key(bucket_name, resolution, now)
+        # total_size holds the last sample, so rollup rows plot like raw rows
+        attrs = table.update_item(
+            Key=key,
+            UpdateExpression=(
+                "SET total_size = :size, "
+                "min_size = if_not_exists(min_size, :size), "
+                "max_size = if_not_exists(max_size, :size) "
+                "ADD sample_count :one"
+            ),
+            ExpressionAttributeValues={":size": total_size, ":one": 1},
+            ReturnValues="ALL_NEW",
+        )["Attributes"]
+
+        # Only samples outside the current range need a second (conditional) write
+        if total_size < attrs["min_size"]:
+            _tighten_rollup(table, key, "min_size", ">", total_size)
+        if total_size > attrs["max_size"]:
+            _tighten_rollup(table, key, "max_size", "<", total_size)
+
+
+def _tighten_rollup(table, key, attr, op, size):
+    try:
+        table.update_item(
+            Key=key,
+            UpdateExpression=f"SET {attr} = :size",
+            ConditionExpression=f"{attr} {op} :size",
+            ExpressionAttributeValues={":size": size},
+        )
+    except client.exceptions.ConditionalCheckFailedException:
+        pass  # a concurrent batch already moved it further
+
+
+def write_history(table, bucket_name, total_size, object_count):
     # get the current timestamp in ISO format
-    timestamp = datetime.now(timezone.utc).isoformat()
+    now = datetime.now(timezone.utc)
+    timestamp = now.isoformat()
 
     # write the record to DynamoDB
-    table = dynamodb.Table(table_name)
     table.put_item(
         Item={
             "bucket_name": bucket_name,
@@ -37,3 +408,49 @@ def handler(event, context):
             "object_count": object_count,
         }
     )
+    update_rollups(table, bucket_name, total_size, now)
+
+
+def handler(event, context):
+    # get the bucket_name and table_name from environment variables
+    bucket_name = os.environ["BUCKET_NAME"]
+    table_name = os.environ["TABLE_NAME"]
+    table = dynamodb.Table(table_name)
+
+    # Manual/scheduled invocation to correct drift in the running total
+    if event.get("reconcile"):
+        total_size, object_count = reconcile(table, bucket_name)
+        write_history(table, bucket_name, total_size, object_count)
+        update_global_max(table, bucket_name, total_size)
+        return {"total_size": total_size, "object_count": object_count}
+
+    # Fold every record in the SQS batch into one net change per bucket, so the
+    # batch costs one running-total update and one history row per bucket.
+    records = {}  # bucket -> [S3 records]
+    failures = []
+    for sqs_record in event["Records"]:
+        try:
+            for record in parse_s3_records(sqs_record):
+                if unquote_plus(record["s3"]["object"]["key"]) in SKIP_KEYS:
+                    continue
+                target = record["s3"]["bucket"].get("name", bucket_name)
+                records.setdefault(target, []).append(record)
+        except Exception as e:
+            print(f"Failed to process message {sqs_record['messageId']}: {e}")
+            failures.append({"itemIdentifier": sqs_record["messageId"]})
+
+    for target, bucket_records in records.items():
+        if TRACKING_MODE == "delta":
+            # Raises on failure so SQS redelivers the batch; reapplying it is
+            # a no-op for the changes that already committed
+            apply_object_changes(table, target, fold_object_events(bucket_records))
+            total_size, object_count = read_running_total(table, target)
+        else:
+            # Recount mode ignores the payload and lists the whole bucket.
+            total_size, object_count = scan_bucket(s3, target, skip_keys=SKIP_KEYS)
+        write_history(table, target, total_size, object_count)
+        update_global_max(table, target, total_size)
+        check_threshold(table, target, total_size)
+
+    # Needs ReportBatchItemFailures on the SQS event source mapping.
+    return {"batchItemFailures": failures}
@@ -0,0 +1,59 @@
+# Shared helpers for the pytest suites of the Lambda handlers. The tests live
+# here rather than next to the handlers so Code.fromAsset doesn't ship them.
+import importlib
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+HW4_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(HW4_DIR, "lambda")
+
+
+def load_lambda(name, module="handler"):
+    """Import lambda/<name>/<module>.py the way the Lambda runtime would.
+
+    Every handler.py is loaded fresh under its own name ("<name>_handler"), so
+    handlers of different Lambdas don't clash and module state starts clean.
+    Other modules are imported under their own name from the Lambda's directory.
+    """
+    directory = os.path.join(LAMBDA_DIR, name)
+    sys.path.insert(0, directory)
+    try:
+        if module != "handler":
+            return importlib.import_module(module)
+        spec = importlib.util.spec_from_file_location(
+            f"{name}_handler", os.path.join(directory, "handler.py")
+        )
+        handler = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(handler)
+        return handler
+    finally:
+        sys.path.remove(directory)
+
+
+def sqs_event(*records, message_id="1"):
+    """One SQS message carrying an SNS-wrapped S3 notification.
+
+    records are (event_name, bucket, key, size) tuples; size is None for removals.
+    """
+    s3_records = [
+        {
+            "eventName": event_name,
+            "s3": {"bucket": {"name": bucket}, "object": {"key": key, "size": size}},
+        }
+        for event_name, bucket, key, size in records
+    ]
+    body = json.dumps({"Message": json.dumps({"Records": s3_records})})
+    return {"Records": [{"messageId": message_id, "body": body}]}
+
+
+@pytest.fixture
+def aws_env(monkeypatch):
+    """Fake credentials and a region, so boto3 clients can be built at import."""
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    return monkeypatch
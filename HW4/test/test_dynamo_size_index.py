@@ -0,0 +1,43 @@
+import pytest
+from conftest import load_lambda
+
+moto = pytest.importorskip("moto")
+import boto3  # noqa: E402
+
+
+@pytest.fixture
+def index(aws_env):
+    size_index = load_lambda("logging", "size_index")
+    with moto.mock_aws():
+        table = boto3.resource("dynamodb").create_table(
+            TableName="sizes",
+            AttributeDefinitions=[{"AttributeName": "object_name", "AttributeType": "S"}],
+            KeySchema=[{"AttributeName": "object_name", "KeyType": "HASH"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield size_index.DynamoSizeIndex(table)
+
+
+def test_pop_many_returns_and_removes_known_sizes(index):
+    index.put_many({f"key-{i}": i + 1 for i in range(20)})
+
+    found = index.pop_many([f"key-{i}" for i in range(0, 20, 2)] + ["never"])
+
+    assert found == {f"key-{i}": i + 1 for i in range(0, 20, 2)}
+    assert index.pop_many(["key-1", "key-2"]) == {"key-1": 2}
+
+
+def test_redelivered_delete_finds_nothing(index):
+    index.put_many({"a": 18})
+
+    assert index.pop_many(["a"]) == {"a": 18}
+    assert index.pop_many(["a"]) == {}
+
+
+def test_discard_matching_keeps_overwritten_entries(index):
+    index.put_many({"a": 1, "b": 2})
+    index.put_many({"b": 5})
+
+    index.discard_matching({"a": 1, "b": 2, "never": 3})
+
+    assert index.pop_many(["a", "b"]) == {"b": 5}
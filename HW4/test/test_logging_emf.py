@@ -0,0 +1,112 @@
+import json
+
+import pytest
+from conftest import load_lambda, sqs_event
+
+moto = pytest.importorskip("moto")
+import boto3  # noqa: E402
+
+
+@pytest.fixture
+def logging_handler(aws_env):
+    handler = load_lambda("logging")
+    aws_env.setattr(handler, "LOG_FORMAT", "emf")
+    return handler
+
+
+@pytest.fixture
+def emf():
+    return load_lambda("logging", "emf")
+
+
+@pytest.fixture
+def history_table(aws_env):
+    with moto.mock_aws():
+        table = boto3.resource("dynamodb").create_table(
+            TableName="history",
+            AttributeDefinitions=[
+                {"AttributeName": "bucket_name", "AttributeType": "S"},
+                {"AttributeName": "timestamp", "AttributeType": "S"},
+            ],
+            KeySchema=[
+                {"AttributeName": "bucket_name", "KeyType": "HASH"},
+                {"AttributeName": "timestamp", "KeyType": "RANGE"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield table
+
+
+@pytest.fixture
+def emf_handler(logging_handler, history_table):
+    size_index = load_lambda("logging", "size_index")
+    logging_handler.size_index = size_index.CachedSizeIndex(
+        size_index.InMemorySizeIndex()
+    )
+    logging_handler.history_table = history_table
+    return logging_handler
+
+
+def test_every_emitted_line_is_valid_emf(emf_handler, emf, history_table, capsys):
+    # bucket-a as the delta tracker leaves it, bucket-b as the recount tracker
+    history_table.put_item(
+        Item={"bucket_name": "bucket-a#total", "timestamp": "current", "total_size": 45}
+    )
+    for second, total_size in [(0, 1), (1, 3)]:
+        history_table.put_item(
+            Item={
+                "bucket_name": "bucket-b",
+                "timestamp": f"2026-01-01T00:00:0{second}",
+                "total_size": total_size,
+            }
+        )
+    emf_handler.handler(
+        sqs_event(
+            ("ObjectCreated:Put", "bucket-a", "a.txt", 18),
+            ("ObjectCreated:Put", "bucket-a", "b.txt", 27),
+            ("ObjectRemoved:Delete", "bucket-a", "a.txt", None),
+            ("ObjectCreated:Put", "bucket-b", "c.txt", 3),
+        ),
+        None,
+    )
+
+    lines = capsys.readouterr().out.splitlines()
+    parsed = {}
+    for line in lines:
+        doc = emf.parse_document(line)
+        assert doc["namespace"] == emf_handler.METRIC_NAMESPACE
+        parsed[doc["dimensions"]["BucketName"]] = doc["metrics"]
+    assert parsed == {
+        "bucket-a": {"SizeDelta": 27, "ObjectEvents": 3, "TotalSize": 45},
+        "bucket-b": {"SizeDelta": 3, "ObjectEvents": 1, "TotalSize": 3},
+    }
+
+
+def test_total_is_left_out_before_the_tracker_wrote_one(emf_handler, emf, capsys):
+    emf_handler.handler(sqs_event(("ObjectCreated:Put", "bucket-a", "a.txt", 18)), None)
+
+    doc = emf.parse_document(capsys.readouterr().out)
+    assert doc["metrics"] == {"SizeDelta": 18, "ObjectEvents": 1}
+
+
+@pytest.mark.parametrize(
+    "size_table, history_table_name", [(None, "history"), ("sizes", None)]
+)
+def test_emf_without_tables_is_refused(
+    logging_handler, aws_env, size_table, history_table_name
+):
+    aws_env.setattr(logging_handler, "SIZE_INDEX_TABLE", size_table)
+    aws_env.setattr(logging_handler, "HISTORY_TABLE_NAME", history_table_name)
+    logging_handler.size_index = None
+
+    with pytest.raises(ValueError):
+        logging_handler.handler(sqs_event(), None)
+
+
+def test_parse_document_rejects_missing_metric_value(emf):
+    line = emf.build_document("NS", {"BucketName": "b"}, {"SizeDelta": (1, "Bytes")})
+    doc = json.loads(line)
+    del doc["SizeDelta"]
+
+    with pytest.raises(ValueError):
+        emf.parse_document(json.dumps(doc))
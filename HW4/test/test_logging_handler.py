@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from conftest import load_lambda, sqs_event
+
+pytest.importorskip("boto3")
+
+
+@pytest.fixture
+def run(aws_env, capsys):
+    """Returns a function that runs one SQS batch and returns the size lines."""
+    handler = load_lambda("logging")
+    size_index = load_lambda("logging", "size_index")
+    aws_env.setattr(handler, "LOG_FORMAT", "lines")
+    backing = size_index.InMemorySizeIndex()
+    handler.size_index = size_index.CachedSizeIndex(backing)
+
+    def run_batch(*records):
+        handler.handler(
+            sqs_event(*((name, "bucket", key, size) for name, key, size in records)),
+            None,
+        )
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        run_batch.stats = lines[-1]["size_cache"]
+        return [
+            (line["object_name"], line["size_delta"])
+            for line in lines
+            if "object_name" in line
+        ]
+
+    run_batch.backing = backing
+    return run_batch
+
+
+def test_create_then_delete_in_later_batch(run):
+    assert run(("ObjectCreated:Put", "a.txt", 18)) == [("a.txt", 18)]
+    assert run.backing.sizes == {"a.txt": 18}
+
+    assert run(("ObjectRemoved:Delete", "a.txt", None)) == [("a.txt", -18)]
+    assert run.backing.sizes == {}
+
+
+def test_delete_of_unknown_object_is_zero(run):
+    assert run(("ObjectRemoved:Delete", "never.txt", None)) == [("never.txt", 0)]
+
+
+def test_create_then_delete_in_one_batch(run):
+    lines = run(
+        ("ObjectCreated:Put", "a.txt", 18),
+        ("ObjectRemoved:Delete", "a.txt", None),
+    )
+
+    assert lines == [("a.txt", 18), ("a.txt", -18)]
+    assert run.backing.sizes == {}
+
+
+def test_overwrite_then_delete_uses_latest_size(run):
+    run(("ObjectCreated:Put", "a.txt", 18))
+    run(("ObjectCreated:Put", "a.txt", 5))
+
+    assert run(("ObjectRemoved:Delete", "a.txt", None)) == [("a.txt", -5)]
+
+
+def test_cache_stats_are_per_invocation(run):
+    run(("ObjectCreated:Put", "a.txt", 18))
+    run(("ObjectRemoved:Delete", "a.txt", None))
+    assert run.stats["hits"] == 1
+
+    run(("ObjectRemoved:Delete", "never.txt", None))
+    assert run.stats == {"hits": 0, "misses": 1, "evictions": 0, "skipped": 0}
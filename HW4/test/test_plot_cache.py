@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from conftest import load_lambda, sqs_event
+
+moto = pytest.importorskip("moto")
+pytest.importorskip("numpy")
+import boto3  # noqa: E402
+
+BUCKET = "plot-cache-bucket"
+TABLE = "history"
+
+
+@pytest.fixture(params=["recount", "delta"])
+def lambdas(request, aws_env):
+    aws_env.setenv("BUCKET_NAME", BUCKET)
+    aws_env.setenv("TABLE_NAME", TABLE)
+    aws_env.setenv("TRACKING_MODE", request.param)
+    aws_env.setenv("PLOT_BACKEND", "svg")
+    with moto.mock_aws():
+        boto3.client("s3").create_bucket(Bucket=BUCKET)
+        boto3.client("dynamodb").create_table(
+            TableName=TABLE,
+            AttributeDefinitions=[
+                {"AttributeName": "bucket_name", "AttributeType": "S"},
+                {"AttributeName": "timestamp", "AttributeType": "S"},
+                {"AttributeName": "total_size", "AttributeType": "N"},
+            ],
+            KeySchema=[
+                {"AttributeName": "bucket_name", "KeyType": "HASH"},
+                {"AttributeName": "timestamp", "KeyType": "RANGE"},
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "bucket-size-index",
+                    "KeySchema": [
+                        {"AttributeName": "bucket_name", "KeyType": "HASH"},
+                        {"AttributeName": "total_size", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield load_lambda("size_tracking"), load_lambda("plotting")
+
+
+def upload(tracker, object_key, body):
+    boto3.client("s3").put_object(Bucket=BUCKET, Key=object_key, Body=body)
+    tracker.handler(
+        sqs_event(("ObjectCreated:Put", BUCKET, object_key, len(body))), None
+    )
+
+
+def plot(plotting):
+    return json.loads(plotting.handler({}, None)["body"])
+
+
+def test_plot_upload_does_not_invalidate_cache(lambdas):
+    tracker, plotting = lambdas
+    upload(tracker, "assignment1.txt", b"Empty Assignment 1")
+
+    assert "cached" not in plot(plotting)
+    # The tracker sees the plot's own upload like any other object
+    head = boto3.client("s3").head_object(Bucket=BUCKET, Key=plotting.PLOT_KEY)
+    tracker.handler(
+        sqs_event(
+            ("ObjectCreated:Put", BUCKET, plotting.PLOT_KEY, head["ContentLength"])
+        ),
+        None,
+    )
+
+    assert plot(plotting)["cached"] is True
+
+
+def test_new_upload_renders_again(lambdas):
+    tracker, plotting = lambdas
+    upload(tracker, "assignment1.txt", b"Empty Assignment 1")
+    plot(plotting)
+
+    upload(tracker, "assignment2.txt", b"Empty Assignment 2222222222")
+
+    assert "cached" not in plot(plotting)
@@ -0,0 +1,107 @@
+from conftest import load_lambda
+
+size_index = load_lambda("logging", "size_index")
+BloomFilter = size_index.BloomFilter
+CachedSizeIndex = size_index.CachedSizeIndex
+InMemorySizeIndex = size_index.InMemorySizeIndex
+
+
+class CountingIndex(InMemorySizeIndex):
+    """InMemorySizeIndex that records the names each pop_many asked for."""
+
+    def __init__(self):
+        super().__init__()
+        self.lookups = []
+
+    def pop_many(self, object_names):
+        self.lookups.append(list(object_names))
+        return super().pop_many(object_names)
+
+
+def test_recent_create_is_answered_locally():
+    backing = CountingIndex()
+    cache = CachedSizeIndex(backing)
+    cache.put_many({"a": 1})
+
+    assert cache.pop_many(["a"]) == {"a": 1}
+    assert backing.lookups == []
+    assert cache.stats["hits"] == 1
+
+    # The remote entry is only dropped at flush
+    assert backing.sizes == {"a": 1}
+    cache.flush()
+    assert backing.sizes == {}
+
+
+def test_overwrite_elsewhere_keeps_the_remote_entry():
+    backing = CountingIndex()
+    cache = CachedSizeIndex(backing)
+    cache.put_many({"a": 1})
+    backing.put_many({"a": 7})  # another container overwrote it
+
+    assert cache.pop_many(["a"]) == {"a": 1}
+    cache.flush()
+    assert backing.sizes == {"a": 7}
+
+
+def test_stale_entry_is_looked_up(monkeypatch):
+    backing = CountingIndex()
+    cache = CachedSizeIndex(backing, recent_ttl=30)
+    cache.put_many({"a": 1})
+    backing.put_many({"a": 7})
+
+    size, remembered_at = cache.recent["a"]
+    cache.recent["a"] = (size, remembered_at - 31)
+    assert cache.pop_many(["a"]) == {"a": 7}
+    assert backing.lookups == [["a"]]
+    assert backing.sizes == {}
+
+
+def test_lru_evicts_least_recently_created():
+    backing = CountingIndex()
+    cache = CachedSizeIndex(backing, capacity=2)
+    cache.put_many({"a": 1, "b": 2})
+    cache.put_many({"a": 10})  # refreshes a
+    cache.put_many({"c": 3})  # evicts b
+
+    assert list(cache.recent) == ["a", "c"]
+    assert cache.stats["evictions"] == 1
+    assert cache.pop_many(["b"]) == {"b": 2}
+    assert backing.lookups == [["b"]]
+
+
+def test_unknown_key_is_skipped_until_created():
+    backing = CountingIndex()
+    cache = CachedSizeIndex(backing)
+
+    assert cache.pop_many(["x"]) == {}
+    assert cache.pop_many(["x"]) == {}
+    assert backing.lookups == [["x"]]
+    assert cache.stats["skipped"] == 1
+
+    # Created elsewhere: the filter is reset, so the next delete asks again
+    cache.put_many({"x": 5})
+    cache.recent.clear()
+    assert cache.pop_many(["x"]) == {"x": 5}
+    assert backing.lookups == [["x"], ["x"]]
+
+
+def test_missing_filter_expires(monkeypatch):
+    backing = CountingIndex()
+    cache = CachedSizeIndex(backing, missing_ttl=30)
+    cache.pop_many(["x"])
+    backing.put_many({"x": 5})  # created by another container
+
+    monkeypatch.setattr(cache, "missing_reset_at", cache.missing_reset_at - 31)
+    assert cache.pop_many(["x"]) == {"x": 5}
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(num_bits=1 << 10)
+    keys = [f"key-{i}" for i in range(200)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    bloom.clear()
+    assert not any(key in bloom for key in keys)
@@ -16,6 +16,8 @@ ReplicatorStack(
     bucket_src=storage.bucket_src,
     bucket_dst=storage.bucket_dst,
     table=storage.table,
+    # cdk deploy -c replicator_queue=true to buffer S3 events through SQS
+    use_queue=str(app.node.try_get_context("replicator_queue")).lower() == "true",
 )
 
 # Stack 3: Cleaner Lambda (depends on storage resources)
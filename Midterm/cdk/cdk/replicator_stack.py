@@ -6,6 +6,8 @@ from aws_cdk import (
     aws_dynamodb as dynamodb,
     aws_events as events,
     aws_events_targets as targets,
+    aws_lambda_event_sources as event_sources,
+    aws_sqs as sqs,
     Duration,
 )
 from constructs import Construct
@@ -19,21 +21,28 @@ class ReplicatorStack(Stack):
         bucket_src: s3.IBucket,
         bucket_dst: s3.IBucket,
         table: dynamodb.ITable,
+        use_queue: bool = False,
         **kwargs,
     ):
         super().__init__(scope, construct_id, **kwargs)
 
+        # Room for multipart copies of large objects
+        timeout = Duration.minutes(5)
+
         # Replicator Lambda
         replicator_fn = lambda_.Function(
             self, "ReplicatorLambda",
             runtime=lambda_.Runtime.PYTHON_3_12,
             handler="handler.handler",
             code=lambda_.Code.from_asset("../lambda/replicator"),
-            timeout=Duration.seconds(30),
+            timeout=timeout,
+            memory_size=512,
             environment={
                 "BUCKET_SRC": bucket_src.bucket_name,
                 "BUCKET_DST": bucket_dst.bucket_name,
                 "TABLE_NAME": table.table_name,
+                # An in-progress dedup claim can't outlive its invocation
+                "DEDUP_LEASE_SECONDS": str(int(timeout.to_seconds())),
             },
         )
 
@@ -56,4 +65,25 @@ class ReplicatorStack(Stack):
                 },
             ),
         )
-        rule.add_target(targets.LambdaFunction(replicator_fn))
+
+        if use_queue:
+            # Optional SQS buffer: bursts reach the replicator in batches
+            # instead of one invocation per event
+            dlq = sqs.Queue(self, "ReplicatorDLQ", retention_period=Duration.days(14))
+            queue = sqs.Queue(
+                self, "ReplicatorQueue",
+                # AWS recommends at least 6x the function timeout
+                visibility_timeout=Duration.minutes(30),
+                dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=5, queue=dlq),
+            )
+            rule.add_target(targets.SqsQueue(queue))
+            replicator_fn.add_event_source(
+                event_sources.SqsEventSource(
+                    queue,
+                    batch_size=100,
+                    max_batching_window=Duration.seconds(1),
+                    report_batch_item_failures=True,
+                )
+            )
+        else:
+            rule.add_target(targets.LambdaFunction(replicator_fn))
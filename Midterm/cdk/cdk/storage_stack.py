@@ -45,6 +45,8 @@ class StorageStack(Stack):
             ),
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
             removal_policy=RemovalPolicy.DESTROY,
+            # Replicator dedup ledger rows expire on their own
+            time_to_live_attribute="expires_at",
         )
 
         # GSI: status + disowned_at
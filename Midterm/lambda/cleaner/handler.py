@@ -9,6 +9,34 @@ BUCKET_DST = os.environ["BUCKET_DST"]
 TABLE_NAME = os.environ["TABLE_NAME"]
 GSI_NAME = "status-disowned_at-index"
 DISOWN_GRACE_SECONDS = 10
+# Reference counts for objects shared by several copy rows.
+# Must match REF_PREFIX in lambda/replicator/handler.py.
+REF_PREFIX = "#ref/"
+
+
+def ref_key(physical_key):
+    return {"original_key": f"{REF_PREFIX}{physical_key}", "copy_key": "#ref"}
+
+
+def release_copy(table, item):
+    """Drop a copy row's reference; delete its object once nothing refers to it.
+
+    Must match release_copy in lambda/replicator/handler.py.
+    """
+    physical_key = item.get("physical_key")
+    if physical_key is None:
+        # Row from before content dedup: the copy owns its object
+        s3.delete_object(Bucket=BUCKET_DST, Key=item["copy_key"])
+        return
+    refs = table.update_item(
+        Key=ref_key(physical_key),
+        UpdateExpression="ADD refs :minus_one",
+        ExpressionAttributeValues={":minus_one": -1},
+        ReturnValues="UPDATED_NEW",
+    )["Attributes"]["refs"]
+    if refs <= 0:
+        s3.delete_object(Bucket=BUCKET_DST, Key=physical_key)
+        table.delete_item(Key=ref_key(physical_key))
 
 
 def handler(event, context):
@@ -36,22 +64,27 @@ def handler(event, context):
         copy_key = item["copy_key"]
         original_key = item["original_key"]
 
-        # Delete copy from Bucket Dst
+        # Update Table T first: mark as DELETED so it won't appear in future
+        # queries, and so a rerun can't release the same reference twice
+        try:
+            table.update_item(
+                Key={
+                    "original_key": original_key,
+                    "copy_key": copy_key,
+                },
+                UpdateExpression="SET #s = :s",
+                ConditionExpression="#s = :disowned",
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={":s": "DELETED", ":disowned": "DISOWNED"},
+            )
+        except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            continue  # a concurrent run got it
+
+        # Delete copy from Bucket Dst, unless other rows still share its object
         try:
-            s3.delete_object(Bucket=BUCKET_DST, Key=copy_key)
-            print(f"Deleted from dst: {copy_key}")
+            release_copy(table, item)
+            print(f"Released from dst: {copy_key}")
         except Exception as e:
             print(f"Warning: could not delete {copy_key}: {e}")
 
-        # Update Table T: mark as DELETED so it won't appear in future queries
-        table.update_item(
-            Key={
-                "original_key": original_key,
-                "copy_key": copy_key,
-            },
-            UpdateExpression="SET #s = :s",
-            ExpressionAttributeNames={"#s": "status"},
-            ExpressionAttributeValues={":s": "DELETED"},
-        )
-
     print(f"Cleaner done: {len(items)} copies removed")
@@ -1,20 +1,85 @@
+import json
 import os
+import queue
+import time
 import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
-s3 = boto3.client("s3")
-dynamodb = boto3.resource("dynamodb")
-
 BUCKET_SRC = os.environ["BUCKET_SRC"]
 BUCKET_DST = os.environ["BUCKET_DST"]
 TABLE_NAME = os.environ["TABLE_NAME"]
 
 MAX_COPIES = 3
 
+# Per-key counter row kept next to the copies: active_count is the number of
+# ACTIVE copies and active_floor the copy_key at or above which they all sit
+# (everything older was disowned). It has no status, so the cleaner's GSI
+# never sees it.
+COUNTER_COPY_KEY = "#active"
+
+# Copy rows record the source ETag and the physical_key in Bucket Dst holding
+# their bytes. A re-upload of unchanged content gets a row pointing at the
+# existing object; "#ref/<physical_key>" rows count the copy rows per object.
+# Must match lambda/cleaner/handler.py.
+REF_PREFIX = "#ref/"
+
+# Objects larger than this are copied with a parallel multipart copy instead of
+# one copy_object call (which can't copy more than 5 GiB at all)
+MULTIPART_THRESHOLD = int(os.environ.get("MULTIPART_THRESHOLD", str(256 * 1024 * 1024)))
+PART_SIZE = int(os.environ.get("PART_SIZE", str(64 * 1024 * 1024)))
+COPY_CONCURRENCY = int(os.environ.get("COPY_CONCURRENCY", "16"))
+# S3 multipart limits
+MAX_PARTS = 10000
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Keys replicated in parallel when events arrive in SQS batches
+REPLICATOR_WORKERS = int(os.environ.get("REPLICATOR_WORKERS", "8"))
+# Parallel status updates when a delete disowns a key's copies
+DISOWN_WORKERS = int(os.environ.get("DISOWN_WORKERS", "16"))
+
+# Events already handled are remembered this long (Table T TTL on expires_at),
+# so at-least-once redeliveries are dropped instead of copied again
+DEDUP_TTL_SECONDS = int(os.environ.get("DEDUP_TTL_SECONDS", str(24 * 3600)))
+# An IN_PROGRESS claim older than this is taken over by the next delivery, as
+# its invocation timed out or crashed. Set to the function timeout by the stack.
+DEDUP_LEASE_SECONDS = int(os.environ.get("DEDUP_LEASE_SECONDS", "900"))
+METRIC_NAMESPACE = os.environ.get("METRIC_NAMESPACE", "Midterm/Replicator")
+
+# botocore keeps max_pool_connections (default 10) open per client, and a
+# thread that finds them all busy waits for one. Every batch worker may be
+# running a multipart copy at once.
+s3 = boto3.client(
+    "s3",
+    config=Config(max_pool_connections=REPLICATOR_WORKERS * (COPY_CONCURRENCY + 1)),
+)
+dynamodb = boto3.resource("dynamodb")
+# Low-level client for calls made from worker threads (resources aren't
+# thread-safe); every batch worker may be disowning a key's copies at once
+dynamodb_client = boto3.client(
+    "dynamodb",
+    config=Config(max_pool_connections=REPLICATOR_WORKERS * DISOWN_WORKERS),
+)
+# Table T resources for handle_batch workers, one per worker at a time and kept
+# while the container is warm
+batch_tables = queue.SimpleQueue()
+
 
 def handler(event, context):
     table = dynamodb.Table(TABLE_NAME)
 
+    # Buffered through SQS: each record body is one EventBridge event
+    if "Records" in event:
+        return handle_batch(event["Records"])
+
+    duplicate = process_event(table, event)
+    emit_dedup_metrics(1, int(duplicate))
+
+
+def process_event(table, event):
+    """Replicate one EventBridge event; returns True if it was a redelivery."""
     # EventBridge S3 event format:
     # event["detail-type"] = "Object Created" or "Object Deleted"
     # event["detail"]["object"]["key"] = object key
@@ -23,14 +88,185 @@ def handler(event, context):
 
     if not original_key:
         print("No object key found in event, skipping.")
-        return
+        return False
+
+    ledger_key = dedup_key(event, original_key)
+    lease = None
+    if ledger_key:
+        lease = claim_event(table, ledger_key)
+        if lease is None:
+            print(f"Duplicate delivery for {original_key}, skipping.")
+            return True
+
+    try:
+        if detail_type == "Object Created":
+            handle_put(table, original_key)
+        elif detail_type == "Object Deleted":
+            handle_delete(table, original_key)
+        else:
+            print(f"Unknown detail-type: {detail_type}, skipping.")
+    except Exception:
+        # Let the retry through the ledger
+        if ledger_key:
+            release_event(table, ledger_key, lease)
+        raise
+    if ledger_key:
+        finish_event(table, ledger_key, lease)
+    return False
+
+
+def dedup_key(event, original_key):
+    """Ledger row for an event: the S3 sequencer is the same for duplicate
+    notifications of one change; EventBridge's id is the fallback. None if the
+    event carries neither."""
+    sequencer = event.get("detail", {}).get("sequencer")
+    event_id = f"{original_key}/{sequencer}" if sequencer else event.get("id")
+    if not event_id:
+        return None
+    # Own partition and no disowned_at, so copy queries and the cleaner's GSI
+    # skip it
+    return {"original_key": f"#dedup/{event_id}", "copy_key": "#dedup"}
+
+
+def claim_event(table, ledger_key):
+    """Mark the event IN_PROGRESS in the ledger and return the claim's lease.
+
+    None if the event is already DONE. Raises while another delivery holds an
+    unexpired claim, so this one is retried rather than dropped in case that
+    invocation fails.
+    """
+    now = int(time.time())
+    lease = now + DEDUP_LEASE_SECONDS
+    try:
+        table.put_item(
+            Item={
+                **ledger_key,
+                "status": "IN_PROGRESS",
+                "lease_until": lease,
+                "expires_at": now + DEDUP_TTL_SECONDS,
+            },
+            ConditionExpression=(
+                "attribute_not_exists(original_key) OR "
+                "(#s = :in_progress AND lease_until < :now)"
+            ),
+            ExpressionAttributeNames={"#s": "status"},
+            ExpressionAttributeValues={":in_progress": "IN_PROGRESS", ":now": now},
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        item = table.get_item(Key=ledger_key, ConsistentRead=True).get("Item")
+        if item is None or item["status"] != "DONE":
+            raise RuntimeError(
+                f"{ledger_key['original_key']} is claimed by another delivery"
+            )
+        return None
+    return lease
+
+
+def finish_event(table, ledger_key, lease):
+    """Move our claim to DONE, so later deliveries of the event are dropped."""
+    try:
+        table.update_item(
+            Key=ledger_key,
+            UpdateExpression="SET #s = :done REMOVE lease_until",
+            ConditionExpression="lease_until = :lease",
+            ExpressionAttributeNames={"#s": "status"},
+            ExpressionAttributeValues={":done": "DONE", ":lease": lease},
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        # Our lease ran out and another delivery took the claim; it marks DONE
+        print(f"Lost the claim on {ledger_key['original_key']} before finishing")
+
+
+def release_event(table, ledger_key, lease):
+    """Drop our claim after a failure so the retry is not taken for a duplicate."""
+    try:
+        table.delete_item(
+            Key=ledger_key,
+            ConditionExpression="lease_until = :lease",
+            ExpressionAttributeValues={":lease": lease},
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass  # already taken over by another delivery
+
+
+def emit_dedup_metrics(events, duplicates):
+    """Print an Embedded Metric Format line; CloudWatch turns it into metrics."""
+    print(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRIC_NAMESPACE,
+                            "Dimensions": [[]],
+                            "Metrics": [
+                                {"Name": "Events", "Unit": "Count"},
+                                {"Name": "DuplicateEvents", "Unit": "Count"},
+                                {"Name": "DedupHitRate", "Unit": "Percent"},
+                            ],
+                        }
+                    ],
+                },
+                "Events": events,
+                "DuplicateEvents": duplicates,
+                "DedupHitRate": 100.0 * duplicates / events if events else 0.0,
+            }
+        )
+    )
+
+
+def checkout_table():
+    """A Table T resource no other thread is using; hand it back with put()."""
+    try:
+        return batch_tables.get_nowait()
+    except queue.Empty:
+        # Each session has its own resource and client, so threads share nothing
+        return boto3.session.Session().resource("dynamodb").Table(TABLE_NAME)
 
-    if detail_type == "Object Created":
-        handle_put(table, original_key)
-    elif detail_type == "Object Deleted":
-        handle_delete(table, original_key)
-    else:
-        print(f"Unknown detail-type: {detail_type}, skipping.")
+
+def handle_batch(records):
+    """Replicate an SQS batch, returning the messages that failed.
+
+    Events for one key run in order on one worker; different keys run in
+    parallel. Once an event fails, the later events for that key are failed
+    too, so they are retried after it rather than applied out of order. A body
+    that isn't valid JSON fails only its own message.
+    """
+    by_key = {}  # original_key -> [(message id, event)], in arrival order
+    failed = []
+    for record in records:
+        try:
+            event = json.loads(record["body"])
+            original_key = event.get("detail", {}).get("object", {}).get("key", "")
+        except Exception as e:
+            print(f"Failed to parse message {record['messageId']}: {e}")
+            failed.append(record["messageId"])
+            continue
+        by_key.setdefault(original_key, []).append((record["messageId"], event))
+
+    def replicate_key(events):
+        """Returns (failed message ids, number of duplicate deliveries)."""
+        table = checkout_table()
+        duplicates = 0
+        try:
+            for i, (message_id, event) in enumerate(events):
+                try:
+                    duplicates += process_event(table, event)
+                except Exception as e:
+                    print(f"Failed to process message {message_id}: {e}")
+                    return [message_id for message_id, _ in events[i:]], duplicates
+            return [], duplicates
+        finally:
+            batch_tables.put(table)
+
+    with ThreadPoolExecutor(max_workers=REPLICATOR_WORKERS) as pool:
+        results = list(pool.map(replicate_key, by_key.values()))
+    failed += [m for ids, _ in results for m in ids]
+    emit_dedup_metrics(len(records), sum(d for _, d in results))
+
+    # Needs ReportBatchItemFailures on the SQS event source mapping.
+    return {"batchItemFailures": [{"itemIdentifier": m} for m in failed]}
 
 
 def handle_put(table, original_key):
@@ -38,12 +274,16 @@ def handle_put(table, original_key):
     timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
     copy_key = f"{original_key}/{timestamp}"
 
-    # Copy object to Bucket Dst
-    s3.copy_object(
-        Bucket=BUCKET_DST,
-        CopySource={"Bucket": BUCKET_SRC, "Key": original_key},
-        Key=copy_key,
-    )
+    # Reuse the newest copy's object if the content hasn't changed, otherwise
+    # copy object to Bucket Dst
+    head = s3.head_object(Bucket=BUCKET_SRC, Key=original_key)
+    physical_key = find_unchanged_copy(table, original_key, head["ETag"])
+    if physical_key is None:
+        physical_key = copy_key
+        copy_to_dst(original_key, copy_key, head)
+        table.put_item(Item={**ref_key(physical_key), "refs": 1})
+    else:
+        print(f"Content unchanged, {copy_key} shares {physical_key}")
 
     # Add new record to Table T
     table.put_item(
@@ -53,58 +293,341 @@ def handle_put(table, original_key):
             "created_at": timestamp,
             "status": "ACTIVE",
             "disowned_at": "NONE",  # placeholder so GSI SK always has a value
+            "etag": head["ETag"],
+            "physical_key": physical_key,
         }
     )
 
-    # Check if there are now more than MAX_COPIES; if so, delete the oldest
+    # Count the new copy; above MAX_COPIES evict the oldest, found by copy_key
+    # order (its timestamp suffix) rather than by reading every copy
+    active_count, floor = count_active_copy(table, original_key)
+    if floor and copy_key < floor:
+        # The source was deleted while we copied: handle_delete already moved
+        # the floor past this copy, so disown it ourselves and uncount it,
+        # unless handle_delete's query found it first and did both
+        if disown_copy(original_key, copy_key, floor.rsplit("/", 1)[1]):
+            adjust_counter(table, original_key, -1, limit=None)
+        print(f"PUT superseded by delete: {original_key} -> {copy_key} disowned")
+        return
+    if active_count > MAX_COPIES:
+        evict_oldest(table, original_key, active_count - MAX_COPIES, floor)
+
+    print(f"PUT handled: {original_key} -> {copy_key}")
+
+
+def ref_key(physical_key):
+    return {"original_key": f"{REF_PREFIX}{physical_key}", "copy_key": "#ref"}
+
+
+def find_unchanged_copy(table, original_key, etag):
+    """physical_key of the newest copy if it is ACTIVE with the same ETag.
+
+    Takes a reference on it; None if there is no such copy, or if its object
+    is being released (refs already at zero), in which case we copy again.
+    """
     response = table.query(
-        KeyConditionExpression=boto3.dynamodb.conditions.Key("original_key").eq(original_key),
+        KeyConditionExpression=copies_condition(original_key),
+        ScanIndexForward=False,
+        Limit=1,
+        ConsistentRead=True,
     )
-    items = response["Items"]
+    newest = response["Items"][0] if response["Items"] else None
+    if not newest or newest["status"] != "ACTIVE" or newest.get("etag") != etag:
+        return None
 
-    # Only count ACTIVE copies, sort by created_at ascending (oldest first)
-    active_items = [i for i in items if i["status"] == "ACTIVE"]
-    active_items.sort(key=lambda x: x["created_at"])
-
-    if len(active_items) > MAX_COPIES:
-        oldest = active_items[0]
-        try:
-            s3.delete_object(Bucket=BUCKET_DST, Key=oldest["copy_key"])
-        except Exception as e:
-            print(f"Warning: could not delete {oldest['copy_key']} from dst: {e}")
-        table.delete_item(
-            Key={
-                "original_key": oldest["original_key"],
-                "copy_key": oldest["copy_key"],
-            }
+    physical_key = newest["physical_key"]
+    try:
+        table.update_item(
+            Key=ref_key(physical_key),
+            UpdateExpression="ADD refs :one",
+            ConditionExpression="refs > :zero",
+            ExpressionAttributeValues={":one": 1, ":zero": 0},
         )
-        print(f"Deleted oldest copy: {oldest['copy_key']}")
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return None
+    return physical_key
 
-    print(f"PUT handled: {original_key} -> {copy_key}")
 
+def release_copy(table, item):
+    """Drop a copy row's reference; delete its object once nothing refers to it.
 
-def handle_delete(table, original_key):
-    # Query all copies of this original_key
-    response = table.query(
-        KeyConditionExpression=boto3.dynamodb.conditions.Key("original_key").eq(original_key),
+    Call only after the row itself has been removed or marked DELETED, so a
+    retry can't release the same reference twice.
+    Must match release_copy in lambda/cleaner/handler.py.
+    """
+    physical_key = item.get("physical_key")
+    if physical_key is None:
+        # Row from before content dedup: the copy owns its object
+        s3.delete_object(Bucket=BUCKET_DST, Key=item["copy_key"])
+        return
+    refs = table.update_item(
+        Key=ref_key(physical_key),
+        UpdateExpression="ADD refs :minus_one",
+        ExpressionAttributeValues={":minus_one": -1},
+        ReturnValues="UPDATED_NEW",
+    )["Attributes"]["refs"]
+    if refs <= 0:
+        s3.delete_object(Bucket=BUCKET_DST, Key=physical_key)
+        table.delete_item(Key=ref_key(physical_key))
+
+
+def counter_key(original_key):
+    return {"original_key": original_key, "copy_key": COUNTER_COPY_KEY}
+
+
+def copies_condition(original_key, floor=None, ceiling=None):
+    """Key condition for the copy rows of original_key between floor and ceiling."""
+    # Timestamp suffixes only use digits, "T" and "Z", which all sort below "~"
+    return Key("original_key").eq(original_key) & Key("copy_key").between(
+        floor or f"{original_key}/", ceiling or f"{original_key}/~"
     )
-    items = response["Items"]
 
+
+def count_active_copy(table, original_key):
+    """Add one to the key's ACTIVE counter; returns (active_count, active_floor)."""
+    try:
+        attrs = table.update_item(
+            Key=counter_key(original_key),
+            UpdateExpression="ADD active_count :one",
+            ConditionExpression="attribute_exists(active_count)",
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="ALL_NEW",
+        )["Attributes"]
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        # No counter yet (new key, or copies made before counters existed)
+        return seed_counter(table, original_key)
+    return int(attrs["active_count"]), attrs.get("active_floor")
+
+
+def seed_counter(table, original_key):
+    """Count the key's ACTIVE copies once and store the result as its counter."""
+    active = []
+    kwargs = {
+        "KeyConditionExpression": copies_condition(original_key),
+        "FilterExpression": Attr("status").eq("ACTIVE"),
+        "ProjectionExpression": "copy_key",
+        "ConsistentRead": True,
+    }
+    while True:
+        response = table.query(**kwargs)
+        active.extend(item["copy_key"] for item in response["Items"])
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    # ACTIVE copies are always newer than disowned ones, so the oldest is the floor
+    floor = active[0] if active else f"{original_key}/"
+    try:
+        table.update_item(
+            Key=counter_key(original_key),
+            UpdateExpression="SET active_count = :count, active_floor = :floor",
+            ConditionExpression="attribute_not_exists(active_count)",
+            ExpressionAttributeValues={":count": len(active), ":floor": floor},
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        # Seeded concurrently; use that count rather than risk counting twice
+        item = table.get_item(Key=counter_key(original_key), ConsistentRead=True)["Item"]
+        return int(item["active_count"]), item.get("active_floor")
+    return len(active), floor
+
+
+def evict_oldest(table, original_key, excess, floor):
+    """Delete up to `excess` of the oldest ACTIVE copies.
+
+    Each eviction first takes a slot by decrementing the counter only while it
+    is above MAX_COPIES, then deletes the row only if it is still ACTIVE, so
+    concurrent puts never evict more than needed and never race on one copy.
+    """
+    kwargs = {
+        "KeyConditionExpression": copies_condition(original_key, floor),
+        "Limit": excess,
+        "ConsistentRead": True,
+    }
+    evicted = 0
+    while True:
+        response = table.query(**kwargs)
+        for oldest in response["Items"]:
+            if not adjust_counter(table, original_key, -1):
+                return  # back at MAX_COPIES (another put evicted, or a delete reset it)
+            try:
+                table.delete_item(
+                    Key={"original_key": original_key, "copy_key": oldest["copy_key"]},
+                    ConditionExpression=Attr("status").eq("ACTIVE"),
+                )
+            except table.meta.client.exceptions.ConditionalCheckFailedException:
+                # Already evicted or disowned; give the slot back, try the next
+                adjust_counter(table, original_key, 1)
+                continue
+            try:
+                release_copy(table, oldest)
+            except Exception as e:
+                print(f"Warning: could not delete {oldest['copy_key']} from dst: {e}")
+            print(f"Deleted oldest copy: {oldest['copy_key']}")
+            evicted += 1
+            if evicted == excess:
+                return
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def adjust_counter(table, original_key, delta, limit=MAX_COPIES):
+    """Add delta to active_count; a decrement only applies above limit."""
+    kwargs = {"ExpressionAttributeValues": {":delta": delta}}
+    if delta < 0 and limit is not None:
+        kwargs["ConditionExpression"] = "active_count > :limit"
+        kwargs["ExpressionAttributeValues"][":limit"] = limit
+    try:
+        table.update_item(
+            Key=counter_key(original_key),
+            UpdateExpression="ADD active_count :delta",
+            **kwargs,
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
+
+
+def copy_to_dst(original_key, copy_key, head):
+    """Copy the source object (as described by head_object) to copy_key."""
+    source = {"Bucket": BUCKET_SRC, "Key": original_key}
+
+    # CopySourceIfMatch pins the copy to the version we sized, in case the key
+    # is overwritten meanwhile
+    if head["ContentLength"] <= MULTIPART_THRESHOLD:
+        s3.copy_object(
+            Bucket=BUCKET_DST,
+            CopySource=source,
+            CopySourceIfMatch=head["ETag"],
+            Key=copy_key,
+        )
+    else:
+        multipart_copy(source, copy_key, head)
+
+
+def multipart_copy(source, copy_key, head):
+    """Copy byte ranges of the source as parts of one upload, in parallel."""
+    size = head["ContentLength"]
+    # Grow the parts if PART_SIZE would need more than MAX_PARTS of them
+    part_size = max(PART_SIZE, MIN_PART_SIZE, -(-size // MAX_PARTS))
+    ranges = [
+        (number, start, min(start + part_size, size) - 1)
+        for number, start in enumerate(range(0, size, part_size), start=1)
+    ]
+
+    upload_id = s3.create_multipart_upload(
+        Bucket=BUCKET_DST,
+        Key=copy_key,
+        ContentType=head.get("ContentType", "binary/octet-stream"),
+        Metadata=head.get("Metadata", {}),
+    )["UploadId"]
+
+    def copy_part(part):
+        number, first, last = part
+        response = s3.upload_part_copy(
+            Bucket=BUCKET_DST,
+            Key=copy_key,
+            UploadId=upload_id,
+            PartNumber=number,
+            CopySource=source,
+            CopySourceIfMatch=head["ETag"],
+            CopySourceRange=f"bytes={first}-{last}",
+        )
+        return {"PartNumber": number, "ETag": response["CopyPartResult"]["ETag"]}
+
+    try:
+        with ThreadPoolExecutor(max_workers=COPY_CONCURRENCY) as pool:
+            parts = list(pool.map(copy_part, ranges))
+        s3.complete_multipart_upload(
+            Bucket=BUCKET_DST,
+            Key=copy_key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except Exception:
+        # Don't leave billed, invisible parts behind
+        s3.abort_multipart_upload(Bucket=BUCKET_DST, Key=copy_key, UploadId=upload_id)
+        raise
+    print(f"Multipart copy: {copy_key} ({size} bytes, {len(parts)} parts)")
+
+
+def handle_delete(table, original_key):
+    started = time.monotonic()
     disowned_at = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    floor = f"{original_key}/{disowned_at}"
 
-    for item in items:
-        if item["status"] == "ACTIVE":
-            table.update_item(
-                Key={
-                    "original_key": item["original_key"],
-                    "copy_key": item["copy_key"],
-                },
-                UpdateExpression="SET #s = :s, disowned_at = :da",
-                ExpressionAttributeNames={"#s": "status"},
-                ExpressionAttributeValues={
-                    ":s": "DISOWNED",
-                    ":da": disowned_at,
-                },
+    # Move the floor first: a put that counts its copy after this sees a floor
+    # above its copy_key and disowns it itself (see handle_put), and one that
+    # counted before has already written its row, so the query below finds it.
+    # The count is only lowered by the copies actually disowned below, so puts
+    # counted above the new floor meanwhile keep theirs.
+    move_floor = {
+        "Key": counter_key(original_key),
+        "UpdateExpression": "SET active_floor = :floor",
+        "ExpressionAttributeValues": {":floor": floor},
+    }
+    try:
+        table.update_item(
+            ConditionExpression="attribute_exists(active_count)", **move_floor
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        # No counter yet: seed it first, so the copies disowned below were
+        # counted and uncounting them (also on a retry) stays correct
+        seed_counter(table, original_key)
+        table.update_item(**move_floor)
+
+    # Page through the ACTIVE copies below the floor, disowning them in parallel
+    kwargs = {
+        "KeyConditionExpression": copies_condition(original_key, ceiling=floor),
+        "FilterExpression": Attr("status").eq("ACTIVE"),
+        "ProjectionExpression": "copy_key",
+        "ConsistentRead": True,
+    }
+    disowned = 0
+    with ThreadPoolExecutor(max_workers=DISOWN_WORKERS) as pool:
+        while True:
+            response = table.query(**kwargs)
+            copy_keys = [item["copy_key"] for item in response["Items"]]
+            page_disowned = sum(
+                pool.map(
+                    lambda copy_key: disown_copy(original_key, copy_key, disowned_at),
+                    copy_keys,
+                )
             )
+            # Uncounted per page, so a retry after a failure only has the
+            # copies still ACTIVE left to uncount
+            if page_disowned:
+                adjust_counter(table, original_key, -page_disowned, limit=None)
+            disowned += page_disowned
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    elapsed_ms = (time.monotonic() - started) * 1000
+    print(
+        f"DELETE handled: {original_key}, {disowned} copies marked DISOWNED "
+        f"in {elapsed_ms:.0f} ms"
+    )
 
-    print(f"DELETE handled: {original_key}, {len(items)} copies marked DISOWNED")
+
+def disown_copy(original_key, copy_key, disowned_at):
+    """Mark one copy DISOWNED if it is still ACTIVE; returns whether it was.
+
+    The condition also keeps a row that was just evicted from being recreated.
+    """
+    try:
+        dynamodb_client.update_item(
+            TableName=TABLE_NAME,
+            Key={"original_key": {"S": original_key}, "copy_key": {"S": copy_key}},
+            UpdateExpression="SET #s = :s, disowned_at = :da",
+            ConditionExpression="#s = :active",
+            ExpressionAttributeNames={"#s": "status"},
+            ExpressionAttributeValues={
+                ":s": {"S": "DISOWNED"},
+                ":da": {"S": disowned_at},
+                ":active": {"S": "ACTIVE"},
+            },
+        )
+    except dynamodb_client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True